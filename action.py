@@ -5,8 +5,15 @@ Should be used in replay and undo features.
 """
 
 from dataclasses import dataclass, field
-from layer_util import Layer
+from typing import Callable
+from array import array
+import mmap
+import os
+import struct
+import numpy as np
+from layer_util import Layer, get_layers
 from grid import Grid
+from data_structures.typed_array import ArrayT
 
 @dataclass
 class PaintStep:
@@ -45,3 +52,388 @@ class PaintAction:
 
     def add_step(self, step: PaintStep):
         self.steps.append(step)
+
+
+def layer_index(layer: Layer) -> int:
+    """
+    The registry index a packed step stores for layer.
+    :raises ValueError: if layer is not registered, or its index does not fit in a byte.
+    """
+    registry = get_layers()
+    if not 0 <= layer.index < min(len(registry), 256) or registry[layer.index] is not layer:
+        raise ValueError(f"{layer.name} is not a registered layer")
+    return layer.index
+
+def pack_steps(action: PaintAction) -> tuple[array, array, array]:
+    """
+    The layer indices (uint8), xs and ys (uint16) of the steps of action.
+    :raises ValueError: if a step's layer is not registered, or its square is not in [0, 65536).
+    """
+    layers = array('B', [layer_index(step.affected_layer) for step in action.steps])
+    try:
+        xs = array('H', [step.affected_grid_square[0] for step in action.steps])
+        ys = array('H', [step.affected_grid_square[1] for step in action.steps])
+    except OverflowError:
+        raise ValueError("Squares should be in [0, 65536)")
+    return layers, xs, ys
+
+def unpack_steps(layers, xs, ys, is_special: bool) -> PaintAction:
+    """ The PaintAction with the given layer indices, xs and ys as its steps. """
+    registry = get_layers()
+    steps = [
+        PaintStep((x, y), registry[layer])
+        for layer, x, y in zip(layers.tolist(), xs.tolist(), ys.tolist())
+    ]
+    return PaintAction(steps, is_special)
+
+class PackedActions:
+    """
+    PaintActions packed into typed ring buffers, rather than kept as PaintStep objects.
+    Each step is a layer index (uint8) and an x and y (uint16), which is 5 bytes.
+    Each action is the number of its first step (int64) and a flags byte, which is 9 bytes.
+    The flags record whether the action is special, and whether it was recorded as an undo.
+
+    Actions are numbered from 0 in the order they were appended, and so are steps.
+    Only actions [first, end) are held. The oldest are evicted so the buffers stay within max_bytes.
+    The buffers start small and double, up to that budget. With max_bytes None they grow without limit.
+    on_evict, if given, is called with each action just before it is evicted.
+    """
+
+    STEP_BYTES = 5
+    ACTION_BYTES = 9
+    INITIAL_CAPACITY = 64
+    SPECIAL = 1
+    UNDO = 2
+
+    def __init__(self, max_bytes: int | None, on_evict: Callable[[PaintAction], None] | None = None) -> None:
+        """
+        :raises ValueError: if max_bytes cannot hold even one action with one step.
+        """
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict
+        self.first = 0
+        self.end = 0
+        self.step_end = 0 # number of the step after the last one held
+        steps = actions = self.INITIAL_CAPACITY
+        if max_bytes is not None:
+            if max_bytes < self.STEP_BYTES + self.ACTION_BYTES:
+                raise ValueError(f"max_bytes should be at least {self.STEP_BYTES + self.ACTION_BYTES}")
+            # Start within the budget, giving actions at most half of it.
+            actions = min(actions, max(1, max_bytes // 2 // self.ACTION_BYTES))
+            steps = min(steps, (max_bytes - actions * self.ACTION_BYTES) // self.STEP_BYTES)
+        self._new_step_buffers(steps)
+        self._new_action_buffers(actions)
+
+    def __len__(self) -> int:
+        return self.end - self.first
+
+    @property
+    def nbytes(self) -> int:
+        """ Bytes taken by the buffers. """
+        return len(self.layers) * self.STEP_BYTES + len(self.starts) * self.ACTION_BYTES
+
+    def append(self, action: PaintAction, is_undo: bool = False) -> bool:
+        """
+        Adds an action after the last one, evicting the oldest actions if there is no room.
+        Returns False, changing nothing, if the action alone does not fit in max_bytes.
+
+        :raises ValueError: if a step's layer is not registered, or its square is not in [0, 65536).
+        :complexity: O(steps of the action), or O(steps held) when a buffer grows.
+        """
+        layers, xs, ys = pack_steps(action)
+        count = len(layers)
+        if count > self._spare_steps():
+            return False
+        while True:
+            step_room = len(self.layers) - (self.step_end - self.step_start(self.first))
+            action_room = len(self.starts) - len(self)
+            if count <= step_room and action_room >= 1:
+                break
+            if count > step_room and self._grow_steps(self.step_end - self.step_start(self.first) + count):
+                continue
+            if action_room < 1 and self._grow_actions():
+                continue
+            if len(self) == 0:
+                return False
+            if self.on_evict is not None:
+                self.on_evict(self[self.first])
+            self.first += 1
+
+        self.starts[self.end % len(self.starts)] = self.step_end
+        self.flags[self.end % len(self.flags)] = self.SPECIAL * action.is_special + self.UNDO * is_undo
+        for buffer, values in [(self.layers, layers), (self.xs, xs), (self.ys, ys)]:
+            self._write(buffer, self.step_end, values)
+        self.step_end += count
+        self.end += 1
+        return True
+
+    def truncate(self, end: int) -> None:
+        """
+        Forgets every action from end onwards.
+        :complexity: O(1)
+        """
+        if end < self.end:
+            self.step_end = self.step_start(end)
+            self.end = max(end, self.first)
+
+    def step_start(self, k: int) -> int:
+        """ Number of the first step of action k, or of the next step to add if k is end. """
+        if k >= self.end:
+            return self.step_end
+        return self.starts[k % len(self.starts)]
+
+    def step_arrays(self, k: int, stop: int | None = None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        The layer indices, xs and ys of the steps of action k,
+        or of actions k to stop - 1 if stop is given.
+        :pre: first <= k <= stop <= end
+        :complexity: O(steps of the actions)
+        """
+        if stop is None:
+            stop = k + 1
+        positions = np.arange(self.step_start(k), self.step_start(stop)) % len(self.layers)
+        return (
+            self.layers.to_numpy()[positions],
+            self.xs.to_numpy()[positions],
+            self.ys.to_numpy()[positions],
+        )
+
+    def is_special(self, k: int) -> bool:
+        """ Whether action k is special. """
+        return bool(self.flags[k % len(self.flags)] & self.SPECIAL)
+
+    def is_undo(self, k: int) -> bool:
+        """ Whether action k was appended as an undo. """
+        return bool(self.flags[k % len(self.flags)] & self.UNDO)
+
+    def count_specials(self, k: int, stop: int) -> int:
+        """ Number of special actions among actions k to stop - 1. """
+        return sum(flags & self.SPECIAL for flags in self._read(self.flags, k, max(0, stop - k)))
+
+    def __getitem__(self, k: int) -> PaintAction:
+        """
+        Unpacks action k.
+        :raises IndexError: if action k is not held.
+        :complexity: O(steps of the action)
+        """
+        if not self.first <= k < self.end:
+            raise IndexError("Action is not held")
+        return unpack_steps(*self.step_arrays(k), self.is_special(k))
+
+    def _new_step_buffers(self, capacity: int) -> None:
+        self.layers = ArrayT('B', capacity)
+        self.xs = ArrayT('H', capacity)
+        self.ys = ArrayT('H', capacity)
+
+    def _new_action_buffers(self, capacity: int) -> None:
+        self.starts = ArrayT('q', capacity)
+        self.flags = ArrayT('B', capacity)
+
+    def _spare_steps(self) -> int | float:
+        """ Most steps the step buffers may hold, next to the current action buffers. """
+        if self.max_bytes is None:
+            return float('inf')
+        return (self.max_bytes - len(self.starts) * self.ACTION_BYTES) // self.STEP_BYTES
+
+    def _spare_actions(self) -> int | float:
+        """ Most actions the action buffers may hold, next to the current step buffers. """
+        if self.max_bytes is None:
+            return float('inf')
+        return (self.max_bytes - len(self.layers) * self.STEP_BYTES) // self.ACTION_BYTES
+
+    def _grow_steps(self, needed: int) -> bool:
+        """ Doubles the step buffers until they hold needed steps, if max_bytes allows. """
+        capacity = len(self.layers)
+        while capacity < needed:
+            capacity *= 2
+        capacity = min(capacity, self._spare_steps())
+        if capacity <= len(self.layers):
+            return False
+        start = self.step_start(self.first)
+        old = [self._read(buffer, start, self.step_end - start) for buffer in (self.layers, self.xs, self.ys)]
+        self._new_step_buffers(capacity)
+        for buffer, values in zip((self.layers, self.xs, self.ys), old):
+            self._write(buffer, start, values)
+        return True
+
+    def _grow_actions(self) -> bool:
+        """ Doubles the action buffers, if max_bytes allows. """
+        capacity = min(2 * len(self.starts), self._spare_actions())
+        if capacity <= len(self.starts):
+            return False
+        old = [self._read(buffer, self.first, len(self)) for buffer in (self.starts, self.flags)]
+        self._new_action_buffers(capacity)
+        for buffer, values in zip((self.starts, self.flags), old):
+            self._write(buffer, self.first, values)
+        return True
+
+    @staticmethod
+    def _read(buffer: ArrayT, start: int, count: int) -> array:
+        """ The count values from number start, which may wrap around the end of the buffer. """
+        begin = start % len(buffer)
+        head = buffer.array[begin:begin + count]
+        return head + buffer.array[:count - len(head)]
+
+    @staticmethod
+    def _write(buffer: ArrayT, start: int, values: array) -> None:
+        """ Writes values from number start, wrapping around the end of the buffer. """
+        begin = start % len(buffer)
+        split = min(len(values), len(buffer) - begin)
+        buffer.array[begin:begin + split] = values[:split]
+        buffer.array[:len(values) - split] = values[split:]
+
+
+class ActionLog:
+    """
+    PaintActions appended to a binary log file, rather than kept in memory.
+    Can stand in for PackedActions as a ReplayTracker's recording, for sessions too long to hold.
+
+    The file starts with MAGIC. Each action is then a record of a flags byte (see PackedActions)
+    and its step count (uint32), followed by its layer indices (uint8), xs and ys (uint16),
+    all little-endian. So a record is 5 bytes plus 5 per step.
+
+    Only an index of record offsets (int64) and the flags are held in memory, 9 bytes per action.
+    Actions are read back through a memory map of the file, decoding only the ones asked for.
+    Opening an existing log rebuilds the index, dropping a partly written last record.
+    """
+
+    MAGIC = b"PAINTLOG1\n"
+    RECORD = struct.Struct("<BI")
+    STEP_BYTES = 5
+
+    def __init__(self, path: str | os.PathLike) -> None:
+        self.path = path
+        self.file = open(path, "a+b")
+        self.map = None
+        self.first = 0
+        # offsets[k] is where action k's record starts, and offsets[end] where the next one will.
+        self.offsets = array('q')
+        self.flags = array('B')
+        self.file.seek(0, os.SEEK_END)
+        if self.file.tell() == 0:
+            self.file.write(self.MAGIC)
+            self.file.flush()
+        self._load_index()
+
+    def __len__(self) -> int:
+        return self.end
+
+    def __enter__(self) -> ActionLog:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    @property
+    def end(self) -> int:
+        """ Number of actions in the log. """
+        return len(self.flags)
+
+    def append(self, action: PaintAction, is_undo: bool = False) -> bool:
+        """
+        Writes an action to the end of the log. Always returns True, since the log has no budget.
+
+        :raises ValueError: if a step's layer is not registered, or its square is not in [0, 65536).
+        :complexity: O(steps of the action)
+        """
+        layers, xs, ys = pack_steps(action)
+        flags = PackedActions.SPECIAL * action.is_special + PackedActions.UNDO * is_undo
+        record = b"".join([
+            self.RECORD.pack(flags, len(layers)),
+            layers.tobytes(),
+            np.asarray(xs, dtype="<u2").tobytes(),
+            np.asarray(ys, dtype="<u2").tobytes(),
+        ])
+        self.file.write(record)
+        self.flags.append(flags)
+        self.offsets.append(self.offsets[-1] + len(record))
+        return True
+
+    def flush(self) -> None:
+        """ Writes out everything appended so far. """
+        self.file.flush()
+
+    def close(self) -> None:
+        """ Flushes the log and closes its file and memory map. """
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        self.file.close()
+
+    def step_start(self, k: int) -> int:
+        """ Number of the first step of action k, or of the next step to add if k is end. """
+        return (self.offsets[k] - len(self.MAGIC) - self.RECORD.size * k) // self.STEP_BYTES
+
+    def step_arrays(self, k: int, stop: int | None = None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        The layer indices, xs and ys of the steps of action k,
+        or of actions k to stop - 1 if stop is given.
+        :pre: 0 <= k <= stop <= end
+        :complexity: O(actions + steps read)
+        """
+        if stop is None:
+            stop = k + 1
+        data = self._mapped(self.offsets[stop])
+        steps = [[], [], []]
+        for j in range(k, stop):
+            count = (self.offsets[j + 1] - self.offsets[j] - self.RECORD.size) // self.STEP_BYTES
+            start = self.offsets[j] + self.RECORD.size
+            for values, dtype, size in zip(steps, ("u1", "<u2", "<u2"), (1, 2, 2)):
+                values.append(np.frombuffer(data[start:start + count * size], dtype=dtype))
+                start += count * size
+        return tuple(
+            np.concatenate(values).astype(dtype) if values else np.empty(0, dtype)
+            for values, dtype in zip(steps, (np.uint8, np.uint16, np.uint16))
+        )
+
+    def is_special(self, k: int) -> bool:
+        """ Whether action k is special. """
+        return bool(self.flags[k] & PackedActions.SPECIAL)
+
+    def is_undo(self, k: int) -> bool:
+        """ Whether action k was appended as an undo. """
+        return bool(self.flags[k] & PackedActions.UNDO)
+
+    def count_specials(self, k: int, stop: int) -> int:
+        """ Number of special actions among actions k to stop - 1. """
+        return sum(flags & PackedActions.SPECIAL for flags in self.flags[k:stop])
+
+    def __getitem__(self, k: int) -> PaintAction:
+        """
+        Reads action k from the log.
+        :raises IndexError: if there is no action k.
+        :complexity: O(steps of the action)
+        """
+        if not 0 <= k < self.end:
+            raise IndexError("Action is not in the log")
+        return unpack_steps(*self.step_arrays(k), self.is_special(k))
+
+    def _mapped(self, size: int) -> mmap.mmap:
+        """ A read only memory map covering at least the first size bytes of the log. """
+        if self.map is None or len(self.map) < size:
+            self.file.flush()
+            if self.map is not None:
+                self.map.close()
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self.map
+
+    def _load_index(self) -> None:
+        """ Reads the offset of every whole record in the file, cutting off any partial last one. """
+        data = self._mapped(len(self.MAGIC))
+        if data[:len(self.MAGIC)] != self.MAGIC:
+            self.close()
+            raise ValueError(f"{self.path} is not an action log")
+        offset = len(self.MAGIC)
+        while offset + self.RECORD.size <= len(data):
+            flags, count = self.RECORD.unpack_from(data, offset)
+            size = self.RECORD.size + count * self.STEP_BYTES
+            if offset + size > len(data):
+                break
+            self.offsets.append(offset)
+            self.flags.append(flags)
+            offset += size
+        self.offsets.append(offset)
+        if offset < len(data):
+            self.map.close()
+            self.map = None
+            self.file.truncate(offset)
@@ -0,0 +1,63 @@
+"""
+BSet operations against the old bit by bit versions of __len__ and __str__.
+
+A BSet per square is multiplied by the grid size, so each operation is timed
+on the small sets a layer store holds and on large ones.
+
+Run with:
+    python -m benchmarks.bset
+"""
+
+import random
+import timeit
+
+from data_structures.bset import BSet
+
+class OldBSet(BSet):
+    """ BSet with the loops it used to have. """
+
+    def __len__(self) -> int:
+        res = 0
+        for item in range(1, int.bit_length(self.elems) + 1):
+            if item in self:
+                res += 1
+        return res
+
+    def __str__(self):
+        bit_elems = self.elems
+        out_elems = []
+        current = 0
+        while bit_elems:
+            if bit_elems & (1 << current):
+                out_elems.append(str(current+1))
+                bit_elems &= ~(1 << current)
+            current += 1
+        return '{' + ', '.join(out_elems) + '}'
+
+    def old_iter(self) -> list[int]:
+        """ Elements in order, found by testing every position as __len__ did. """
+        return [item for item in range(1, self.elems.bit_length() + 1) if item in self]
+
+def per_call(statement, repeat: int) -> float:
+    """ Microseconds per call of statement, best of 3. """
+    return min(timeit.repeat(statement, number=repeat, repeat=3)) / repeat * 1e6
+
+if __name__ == "__main__":
+    random.seed(0)
+    print(f"{'universe':>9} {'size':>6} {'operation':>10} {'old (us)':>10} {'new (us)':>10}")
+    for universe, size in [(20, 6), (1000, 100), (100000, 5000)]:
+        items = random.sample(range(1, universe + 1), size)
+        old = OldBSet.from_iterable(items)
+        new = BSet.from_iterable(items)
+        repeat = max(1, 20000 // universe)
+        rows = [
+            ("len", lambda: len(old), lambda: len(new)),
+            ("str", lambda: str(old), lambda: str(new)),
+            ("iterate", old.old_iter, lambda: list(new)),
+            ("select", lambda: old.old_iter()[size // 2], lambda: new.select(size // 2)),
+            ("rank", lambda: sum(1 for item in old.old_iter() if item < universe // 2),
+                     lambda: new.rank(universe // 2)),
+        ]
+        for name, old_call, new_call in rows:
+            print(f"{universe:>9} {size:>6} {name:>10} {per_call(old_call, repeat):>10.2f} "
+                  f"{per_call(new_call, repeat):>10.2f}")
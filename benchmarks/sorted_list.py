@@ -0,0 +1,57 @@
+"""
+ArraySortedList against TreapSortedList, for n items added in random order.
+
+Times adding all items, reading every position, finding each item's index
+and deleting them all from the middle. ArraySortedList shuffles on every
+add and delete, so it is only run up to a smaller size.
+
+Run with:
+    python -m benchmarks.sorted_list [largest size] [largest array size]
+"""
+
+import random
+import sys
+import time
+
+from data_structures.array_sorted_list import ArraySortedList
+from data_structures.sorted_list_adt import ListItem
+from data_structures.treap_sorted_list import TreapSortedList
+
+def timed(run) -> float:
+    """ Seconds taken by run(). """
+    start = time.perf_counter()
+    run()
+    return time.perf_counter() - start
+
+def measure(list_class, items: list) -> list[float]:
+    """ Seconds for add, access, index and delete of all items. """
+    sorted_list = list_class(1)
+    def add():
+        for item in items:
+            sorted_list.add(item)
+    def access():
+        for i in range(len(sorted_list)):
+            sorted_list[i]
+    def index():
+        for item in items:
+            sorted_list.index(item)
+    def delete():
+        while len(sorted_list):
+            sorted_list.delete_at_index(len(sorted_list) // 2)
+    return [timed(add), timed(access), timed(index), timed(delete)]
+
+if __name__ == "__main__":
+    largest = int(sys.argv[1]) if len(sys.argv) > 1 else 10**6
+    largest_array = int(sys.argv[2]) if len(sys.argv) > 2 else 10**4
+    random.seed(0)
+    print(f"{'n':>8} {'list':>6} {'add (s)':>9} {'[] (s)':>9} {'index (s)':>10} {'delete (s)':>11}")
+    n = 1000
+    while n <= largest:
+        keys = random.sample(range(10 * n), n)
+        items = [ListItem(key, key) for key in keys]
+        for name, list_class in [("array", ArraySortedList), ("treap", TreapSortedList)]:
+            if list_class is ArraySortedList and n > largest_array:
+                continue
+            add, access, index, delete = measure(list_class, items)
+            print(f"{n:>8} {name:>6} {add:>9.3f} {access:>9.3f} {index:>10.3f} {delete:>11.3f}")
+        n *= 10
@@ -0,0 +1,81 @@
+"""
+Memory and construction time of a Grid for each draw style.
+
+Constructing the Grid is what MyWindow.reset and change_draw_mode pay for.
+The arrays rows show a SetGrid, which keeps a SET canvas in two arrays.
+The sparse rows show a SparseGrid, which creates no stores until painted.
+The fixed rows show the old cost of one store per square with its
+1000-slot arrays, for comparison.
+
+It then paints an ADD grid, erases most of it again, and shows how full
+the additive stores' queues are after each step.
+
+Run with:
+    python -m benchmarks.store_memory [largest size]
+"""
+
+import random
+import sys
+import time
+import tracemalloc
+
+from data_structures.queue_adt import CircularQueue
+from data_structures.stack_adt import ArrayStack
+from grid import Grid, SetGrid, SparseGrid
+from layer_util import get_layers
+
+def measure(make) -> tuple[float, float]:
+    """ Returns the seconds taken and MiB allocated by make(). """
+    start = time.perf_counter()
+    result = make()
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    result = None
+    result = make()
+    mib = tracemalloc.get_traced_memory()[0] / (1 << 20)
+    tracemalloc.stop()
+    return seconds, mib
+
+def fixed_additive_stores(size: int) -> list:
+    """ What an ADD grid used to allocate: a 1000-slot queue and stack per square. """
+    return [(CircularQueue(1000), ArrayStack(1000)) for _ in range(size * size)]
+
+def queue_stats(grid: Grid) -> str:
+    """ Mean capacity and occupancy of the additive stores' queues. """
+    queues = [store.queue_A for _, _, store in grid.squares()]
+    capacity = sum(queue.capacity for queue in queues) / len(queues)
+    occupancy = sum(queue.occupancy for queue in queues) / len(queues)
+    return f"capacity {capacity:7.1f}  occupancy {occupancy:5.2f}"
+
+def paint_and_erase(size: int, layers_per_square: int) -> None:
+    """ Prints queue stats after painting, then after erasing all but one layer per square. """
+    random.seed(0)
+    layers = [layer for layer in get_layers() if layer is not None]
+    grid = Grid(Grid.DRAW_STYLE_ADD, size, size)
+    for _, _, store in grid.squares():
+        for _ in range(random.randint(1, layers_per_square)):
+            store.add(random.choice(layers))
+    print(f"painted {size}x{size}: {queue_stats(grid)}")
+    for _, _, store in grid.squares():
+        while len(store.queue_A) > 1:
+            store.erase(None)
+    print(f" erased {size}x{size}: {queue_stats(grid)}")
+
+if __name__ == "__main__":
+    largest = int(sys.argv[1]) if len(sys.argv) > 1 else 512
+    print(f"{'size':>9} {'style':>9} {'reset (s)':>10} {'memory (MiB)':>13}")
+    size = 32
+    while size <= largest:
+        for style in Grid.DRAW_STYLE_OPTIONS:
+            seconds, mib = measure(lambda: Grid(style, size, size))
+            print(f"{size:>4}x{size:<4} {style:>9} {seconds:>10.3f} {mib:>13.1f}")
+        seconds, mib = measure(lambda: SetGrid(Grid.DRAW_STYLE_SET, size, size))
+        print(f"{size:>4}x{size:<4} {'arrays':>9} {seconds:>10.3f} {mib:>13.1f}")
+        seconds, mib = measure(lambda: SparseGrid(Grid.DRAW_STYLE_ADD, size, size))
+        print(f"{size:>4}x{size:<4} {'sparse':>9} {seconds:>10.3f} {mib:>13.1f}")
+        if size <= 128:
+            seconds, mib = measure(lambda: fixed_additive_stores(size))
+            print(f"{size:>4}x{size:<4} {'fixed':>9} {seconds:>10.3f} {mib:>13.1f}")
+        size *= 2
+    paint_and_erase(128, 100)
@@ -3,6 +3,8 @@
     Items to store should be of time ListItem.
 """
 
+from __future__ import annotations
+import unittest
 from data_structures.referential_array import ArrayR
 from data_structures.sorted_list_adt import *
 
@@ -58,13 +60,11 @@ class ArraySortedList(SortedList[T]):
 
     def _shuffle_right(self, index: int) -> None:
         """ Shuffle items to the right up to a given position. """
-        for i in range(len(self), index, -1):
-            self.array[i] = self.array[i - 1]
+        self.array.move(index, index + 1, len(self) - index)
 
     def _shuffle_left(self, index: int) -> None:
         """ Shuffle items starting at a given position to the left. """
-        for i in range(index, len(self)):
-            self.array[i] = self.array[i + 1]
+        self.array.move(index + 1, index, len(self) - index)
 
     def _resize(self) -> None:
         """ Resize the list. """
@@ -72,12 +72,54 @@ class ArraySortedList(SortedList[T]):
         new_array = ArrayR(2 * len(self.array))
 
         # copying the contents
-        for i in range(self.length):
-            new_array[i] = self.array[i]
+        new_array.copy_from(self.array, 0, 0, self.length)
 
         # referring to the new array
         self.array = new_array
 
+    @classmethod
+    def from_sorted(cls, items: list[ListItem]) -> ArraySortedList:
+        """ Creates a list holding the items, which must already be in order of key.
+        :raises ValueError: if the items are out of order.
+        :complexity: O(n)
+        """
+        for i in range(1, len(items)):
+            if items[i].key < items[i - 1].key:
+                raise ValueError('Items should be given in sorted order')
+        res = cls(len(items))
+        res.array.assign(items)
+        res.length = len(items)
+        return res
+
+    @classmethod
+    def from_iterable(cls, items) -> ArraySortedList:
+        """ Creates a list holding the items, in any order.
+        Items with equal keys keep the order they were given in.
+        :complexity: O(n log n)
+        """
+        return cls.from_sorted(sorted(items, key=lambda item: item.key))
+
+    def merge(self, other: ArraySortedList) -> ArraySortedList:
+        """ Creates a list holding the items of both lists.
+        Items with equal keys come from self before other.
+        :complexity: O(n + m)
+        """
+        items = []
+        i = j = 0
+        while i < len(self) and j < len(other):
+            if other[j].key < self[i].key:
+                items.append(other[j])
+                j += 1
+            else:
+                items.append(self[i])
+                i += 1
+        items.extend(self.array.to_list(i, len(self)))
+        items.extend(other.array.to_list(j, len(other)))
+        res = type(self)(len(items))
+        res.array.assign(items)
+        res.length = len(items)
+        return res
+
     def delete_at_index(self, index: int) -> ListItem:
         """ Delete item at a given position. """
         if index >= len(self):
@@ -124,3 +166,57 @@ class ArraySortedList(SortedList[T]):
                 return mid
 
         return low
+
+
+class TestArraySortedList(unittest.TestCase):
+    """ Tests for the bulk operations of the above class. """
+
+    def setUp(self):
+        self.keys = [5, 1, 4, 1, 9, 2, 6, 5, 3]
+        self.items = [ListItem(i, key) for i, key in enumerate(self.keys)]
+
+    def test_add_and_delete(self):
+        sorted_list = ArraySortedList(1)
+        for item in self.items:
+            sorted_list.add(item)
+        self.assertEqual([sorted_list[i].key for i in range(len(sorted_list))], sorted(self.keys))
+        sorted_list.delete_at_index(0)
+        sorted_list.delete_at_index(3)
+        self.assertEqual([sorted_list[i].key for i in range(len(sorted_list))], [1, 2, 3, 5, 5, 6, 9])
+
+    def test_from_iterable(self):
+        sorted_list = ArraySortedList.from_iterable(self.items)
+        self.assertEqual([sorted_list[i].value for i in range(len(sorted_list))], [1, 3, 5, 8, 2, 0, 7, 6, 4])
+        self.assertRaises(ValueError, ArraySortedList.from_sorted, self.items)
+        self.assertTrue(ArraySortedList.from_sorted([]).is_empty())
+        sorted_list.add(ListItem(9, 0))
+        self.assertEqual(sorted_list[0].value, 9)
+
+    def test_merge(self):
+        first = ArraySortedList.from_iterable(self.items[:4])
+        second = ArraySortedList.from_iterable(self.items[4:])
+        merged = first.merge(second)
+        self.assertEqual([merged[i].key for i in range(len(merged))], sorted(self.keys))
+        # equal keys come from the first list first
+        self.assertEqual([merged[i].value for i in range(len(merged))][5:7], [0, 7])
+        self.assertEqual(len(first.merge(ArraySortedList(1))), 4)
+
+    def test_array_blocks(self):
+        array = ArrayR(6)
+        array.fill(0)
+        for i in range(4):
+            array[i] = i + 1
+        array.move(0, 2, 4)
+        self.assertEqual([array[i] for i in range(6)], [1, 2, 1, 2, 3, 4])
+        array.move(2, 0, 4)
+        self.assertEqual([array[i] for i in range(6)], [1, 2, 3, 4, 3, 4])
+        other = ArrayR(3)
+        other.copy_from(array, 3, 0, 3)
+        self.assertEqual([other[i] for i in range(3)], [4, 3, 4])
+        self.assertRaises(IndexError, other.copy_from, array, 4, 0, 3)
+        array.fill('x', 1, 3)
+        self.assertEqual([array[i] for i in range(6)], [1, 'x', 'x', 4, 3, 4])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,6 +3,9 @@
 """
 
 from __future__ import annotations
+from typing import Iterable, Iterator
+import unittest
+import numpy as np
 from data_structures.set_adt import Set
 
 class BSet(Set[int]):
@@ -14,6 +17,9 @@ class BSet(Set[int]):
         elems (int): bitwise representation of the set
     """
 
+    # Sets with no element above this are iterated bit by bit, larger ones through NumPy.
+    SMALL_BITS = 256
+
     def __init__(self, dummy_capacity: int = 1) -> None:
         """ Initialization. """
         Set.__init__(self)
@@ -35,14 +41,76 @@ class BSet(Set[int]):
         return (self.elems >> (item - 1)) & 1
 
     def __len__(self) -> int:
+        """ Size computation, by counting the set bits. """
+        return self.elems.bit_count()
+
+    def __iter__(self) -> Iterator[int]:
+        """ Yields the elements in increasing order. """
+        if self.elems.bit_length() <= self.SMALL_BITS:
+            bits = self.elems
+            while bits:
+                lowest = bits & -bits
+                yield lowest.bit_length()
+                bits ^= lowest
+        else:
+            # Clearing bits one at a time copies the whole integer each time.
+            for index in np.flatnonzero(self.to_numpy()).tolist():
+                yield index + 1
+
+    def rank(self, item: int) -> int:
+        """ Number of elements smaller than the item.
+        :raises TypeError: if the item is not integer or if not positive.
         """
-        Size computation. The most expensive operation.
-        Use int.bit_length(your_integer) to calculate the bit length.
+        if not isinstance(item, int) or item <= 0:
+            raise TypeError('Set elements should be integers')
+        return (self.elems & ((1 << (item - 1)) - 1)).bit_count()
+
+    def select(self, k: int) -> int:
+        """ The k-th smallest element, counting from 0.
+        Binary searches for the shortest prefix of the bits holding k + 1 elements.
+        :raises IndexError: if the set has k or fewer elements.
         """
-        res = 0
-        for item in range(1, int.bit_length(self.elems) + 1):
-            if item in self:
-                res += 1
+        if not 0 <= k < len(self):
+            raise IndexError(k)
+        low, high = 1, self.elems.bit_length()
+        while low < high:
+            mid = (low + high) // 2
+            if (self.elems & ((1 << mid) - 1)).bit_count() > k:
+                high = mid
+            else:
+                low = mid + 1
+        return low
+
+    @classmethod
+    def from_iterable(cls, items: Iterable[int]) -> BSet:
+        """ Creates a set of the given elements.
+        :raises TypeError: if an item is not integer or if not positive.
+        """
+        res = cls()
+        elems = 0
+        for item in items:
+            if not isinstance(item, int) or item <= 0:
+                raise TypeError('Set elements should be integers')
+            elems |= 1 << (item - 1)
+        res.elems = elems
+        return res
+
+    def to_numpy(self, size: int | None = None) -> np.ndarray:
+        """ Bool array where [i] is True if i + 1 is in the set.
+        The array has `size` entries, by default just enough for the largest element.
+        """
+        if size is None:
+            size = self.elems.bit_length()
+        data = (self.elems & ((1 << size) - 1)).to_bytes((size + 7) // 8, 'little')
+        bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8), bitorder='little')
+        return bits[:size].astype(bool)
+
+    @classmethod
+    def from_numpy(cls, array: np.ndarray) -> BSet:
+        """ Creates the set holding i + 1 for every True [i] of a 1D array. """
+        res = cls()
+        data = np.packbits(np.asarray(array, dtype=bool), bitorder='little')
+        res.elems = int.from_bytes(data.tobytes(), 'little')
         return res
 
     def add(self, item: int) -> None:
@@ -91,17 +159,76 @@ class BSet(Set[int]):
         res.elems = self.elems & ~other.elems
         return res
 
+    def __ior__(self, other: BSet) -> BSet:
+        """ Adds the elements of another set to this one. """
+        self.elems |= other.elems
+        return self
+
+    def __iand__(self, other: BSet) -> BSet:
+        """ Keeps only the elements also in another set. """
+        self.elems &= other.elems
+        return self
+
+    def __isub__(self, other: BSet) -> BSet:
+        """ Removes the elements of another set from this one. """
+        self.elems &= ~other.elems
+        return self
+
+    def __or__(self, other: BSet) -> BSet:
+        return self.union(other)
+
+    def __and__(self, other: BSet) -> BSet:
+        return self.intersection(other)
+
+    def __sub__(self, other: BSet) -> BSet:
+        return self.difference(other)
+
     def __str__(self):
         """ Construct a nice string representation. """
-        bit_elems = self.elems
-        out_elems = []
-        current = 0
-        while bit_elems:
-            if bit_elems & (1 << current):
-                out_elems.append(str(current+1))
-                bit_elems &= ~(1 << current)
-            current += 1
-        return '{' + ', '.join(out_elems) + '}'
+        return '{' + ', '.join(str(item) for item in self) + '}'
+
+
+class TestBSet(unittest.TestCase):
+    """ Tests for the above class."""
+
+    def setUp(self):
+        self.items = [1, 2, 5, 64, 65, 200, 1000]
+        self.set = BSet.from_iterable(self.items)
+
+    def test_len_and_iter(self):
+        self.assertEqual(len(BSet()), 0)
+        self.assertEqual(len(self.set), len(self.items))
+        self.assertEqual(list(self.set), self.items)
+        self.assertEqual(list(BSet.from_iterable([3, 1, 7])), [1, 3, 7])
+        self.assertEqual(str(BSet.from_iterable([4, 1])), '{1, 4}')
+
+    def test_rank_select(self):
+        for k, item in enumerate(self.items):
+            self.assertEqual(self.set.select(k), item)
+            self.assertEqual(self.set.rank(item), k)
+        self.assertEqual(self.set.rank(3), 2)
+        self.assertRaises(IndexError, self.set.select, len(self.items))
+        self.assertRaises(TypeError, self.set.rank, 0)
+        self.assertRaises(TypeError, BSet.from_iterable, [1, -2])
+
+    def test_in_place(self):
+        other = BSet.from_iterable([2, 3, 1000])
+        both = BSet.from_iterable(self.items)
+        both &= other
+        self.assertEqual(list(both), [2, 1000])
+        both |= BSet.from_iterable([7])
+        self.assertEqual(list(both), [2, 7, 1000])
+        both -= other
+        self.assertEqual(list(both), [7])
+        self.assertEqual(list(self.set | other), sorted(set(self.items) | {3}))
+
+    def test_numpy(self):
+        array = self.set.to_numpy()
+        self.assertEqual(len(array), 1000)
+        self.assertEqual((np.flatnonzero(array) + 1).tolist(), self.items)
+        self.assertEqual(BSet.from_numpy(array).elems, self.set.elems)
+        self.assertEqual(self.set.to_numpy(3).tolist(), [True, True, False])
+        self.assertEqual(len(BSet().to_numpy()), 0)
 
 if __name__ == '__main__':
     s = BSet(3)
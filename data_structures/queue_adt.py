@@ -8,8 +8,9 @@ __docformat__ = 'reStructuredText'
 
 import unittest
 from abc import ABC, abstractmethod
-from typing import Generic
+from typing import Generic, Iterator
 from data_structures.referential_array import ArrayR, T
+from data_structures.typed_array import make_array
 
 class Queue(ABC, Generic[T]):
     """ Abstract class for a generic Queue. """
@@ -51,17 +52,20 @@ class CircularQueue(Queue[T]):
          length (int): number of elements in the stack (inherited)
          front (int): index of the element at the front of the queue
          rear (int): index of the first empty space at the back of the queue
-         array (ArrayR[T]): array storing the elements of the queue
+         array (ArrayR[T] | ArrayT): array storing the elements of the queue
+         typecode (str | None): array.array typecode of the elements, None for any object
 
     ArrayR cannot create empty arrays. So MIN_CAPACITY used to avoid this.
     """
     MIN_CAPACITY = 1
 
-    def __init__(self,max_capacity:int) -> None:
+    def __init__(self,max_capacity:int, typecode: str | None = None) -> None:
+        """ With an array.array typecode, the queue holds numbers of that type in an ArrayT. """
         Queue.__init__(self)
         self.front = 0
         self.rear = 0
-        self.array = ArrayR(max(self.MIN_CAPACITY,max_capacity))
+        self.typecode = typecode
+        self.array = make_array(max(self.MIN_CAPACITY,max_capacity), typecode)
 
 
     def append(self, item: T) -> None:
@@ -89,10 +93,34 @@ class CircularQueue(Queue[T]):
         self.front = (self.front+1) % len(self.array)
         return item
 
+    def __getitem__(self, index: int) -> T:
+        """ Returns the element index places behind the front, without serving anything.
+        :raises IndexError: if index is not in [0, len(self))
+        :complexity: O(1)
+        """
+        if not 0 <= index < len(self):
+            raise IndexError("Out of bounds access in queue.")
+        return self.array[(self.front + index) % len(self.array)]
+
+    def __iter__(self) -> Iterator[T]:
+        """ Yields the elements from front to rear, leaving the queue unchanged. """
+        for i in range(len(self)):
+            yield self.array[(self.front + i) % len(self.array)]
+
     def is_full(self) -> bool:
         """ True if the queue is full and no element can be appended. """
         return len(self) == len(self.array)
 
+    @property
+    def capacity(self) -> int:
+        """ Number of elements the array has room for. """
+        return len(self.array)
+
+    @property
+    def occupancy(self) -> float:
+        """ Fraction of the array in use. """
+        return len(self) / len(self.array)
+
     def clear(self) -> None:
         """ Clears all elements from the queue. """
         Queue.__init__(self)
@@ -100,6 +128,163 @@ class CircularQueue(Queue[T]):
         self.rear = 0
 
 
+class DynamicCircularQueue(CircularQueue[T]):
+    """ Circular queue that grows instead of becoming full, and shrinks when mostly empty.
+
+    Starts with a small array and doubles it whenever an append finds
+    it full, so appends are amortised O(1) and there is no capacity limit.
+    The array halves when serves leave it a quarter full, but never below
+    the initial capacity, so alternating append and serve never resize every time.
+
+    Attributes:
+         initial_capacity (int): smallest capacity the array shrinks to
+    """
+    def __init__(self, initial_capacity: int = 1, typecode: str | None = None) -> None:
+        CircularQueue.__init__(self, initial_capacity, typecode)
+        self.initial_capacity = len(self.array)
+
+    def append(self, item: T) -> None:
+        """ Adds an element to the rear of the queue, growing the array if needed.
+        :complexity: O(1) amortised, O(n) when the array is resized
+        """
+        if len(self) == len(self.array):
+            self._resize(2 * len(self.array))
+        CircularQueue.append(self, item)
+
+    def serve(self) -> T:
+        """ Deletes and returns the element at the queue's front,
+        shrinking the array if it is a quarter full.
+        :pre: queue is not empty
+        :raises Exception: if the queue is empty
+        :complexity: O(1) amortised, O(n) when the array is resized
+        """
+        item = CircularQueue.serve(self)
+        self._shrink_if_sparse()
+        return item
+
+    def is_full(self) -> bool:
+        """ The queue grows as needed, so it is never full. """
+        return False
+
+    def clear(self) -> None:
+        """ Clears all elements from the queue, and goes back to the initial capacity. """
+        CircularQueue.clear(self)
+        self.array = make_array(self.initial_capacity, self.typecode)
+
+    def _shrink_if_sparse(self) -> None:
+        """ Halves the array if at most a quarter of it is in use. """
+        if len(self) <= len(self.array) // 4 and len(self.array) > self.initial_capacity:
+            self._resize(max(self.initial_capacity, len(self.array) // 2))
+
+    def _resize(self, capacity: int) -> None:
+        """ Moves the elements, front first, into a new array of the given capacity.
+        The elements may wrap around the end of the old array, so they are
+        copied as at most two blocks: front to the end, then the start to rear.
+        """
+        new_array = make_array(max(self.MIN_CAPACITY, capacity), self.typecode)
+        head = min(len(self), len(self.array) - self.front)
+        new_array.copy_from(self.array, self.front, 0, head)
+        new_array.copy_from(self.array, 0, head, len(self) - head)
+        self.array = new_array
+        self.front = 0
+        self.rear = len(self) % len(self.array)
+
+
+class ReversibleDeque(DynamicCircularQueue[T]):
+    """ Growing circular queue that can also be used from the other end,
+    and reversed in O(1).
+
+    reversed swaps which end of the array is the front. append, serve, [] and
+    iteration all follow the current order, so after reverse() the queue behaves
+    as if its elements had been served and appended back in the opposite order.
+
+    Attributes:
+         reversed (bool): True if the front is at the rear of the array
+    """
+    def __init__(self, initial_capacity: int = 1, typecode: str | None = None) -> None:
+        DynamicCircularQueue.__init__(self, initial_capacity, typecode)
+        self.reversed = False
+
+    def reverse(self) -> None:
+        """ Reverses the order of the elements.
+        :complexity: O(1)
+        """
+        self.reversed = not self.reversed
+
+    def append(self, item: T) -> None:
+        """ Adds an element to the rear of the queue.
+        :complexity: O(1) amortised
+        """
+        if self.reversed:
+            self._push_front(item)
+        else:
+            DynamicCircularQueue.append(self, item)
+
+    def append_front(self, item: T) -> None:
+        """ Adds an element to the front of the queue.
+        :complexity: O(1) amortised
+        """
+        if self.reversed:
+            DynamicCircularQueue.append(self, item)
+        else:
+            self._push_front(item)
+
+    def serve(self) -> T:
+        """ Deletes and returns the element at the queue's front.
+        :pre: queue is not empty
+        :raises Exception: if the queue is empty
+        """
+        if self.reversed:
+            return self._pop_rear()
+        return DynamicCircularQueue.serve(self)
+
+    def serve_rear(self) -> T:
+        """ Deletes and returns the element at the queue's rear.
+        :pre: queue is not empty
+        :raises Exception: if the queue is empty
+        """
+        if self.reversed:
+            return DynamicCircularQueue.serve(self)
+        return self._pop_rear()
+
+    def __getitem__(self, index: int) -> T:
+        """ Returns the element index places behind the front, in the current order.
+        :raises IndexError: if index is not in [0, len(self))
+        :complexity: O(1)
+        """
+        if self.reversed and 0 <= index < len(self):
+            index = len(self) - 1 - index
+        return DynamicCircularQueue.__getitem__(self, index)
+
+    def __iter__(self) -> Iterator[T]:
+        """ Yields the elements from front to rear, in the current order. """
+        for i in range(len(self)):
+            yield self[i]
+
+    def clear(self) -> None:
+        """ Clears all elements from the queue. """
+        DynamicCircularQueue.clear(self)
+        self.reversed = False
+
+    def _push_front(self, item: T) -> None:
+        """ Puts an element before the first one in the array. """
+        if len(self) == len(self.array):
+            self._resize(2 * len(self.array))
+        self.front = (self.front - 1) % len(self.array)
+        self.array[self.front] = item
+        self.length += 1
+
+    def _pop_rear(self) -> T:
+        """ Removes the last element in the array. """
+        if self.is_empty():
+            raise Exception("Queue is empty")
+        self.length -= 1
+        self.rear = (self.rear - 1) % len(self.array)
+        item = self.array[self.rear]
+        self._shrink_if_sparse()
+        return item
+
+
 class TestQueue(unittest.TestCase):
     """ Tests for the above class."""
     EMPTY = 0
@@ -107,9 +292,13 @@ class TestQueue(unittest.TestCase):
     LARGE = 10
     CAPACITY = 20
 
+    def make_queue(self) -> Queue[int]:
+        """ A new empty queue of the class under test. Subclasses override this. """
+        return CircularQueue(self.CAPACITY)
+
     def setUp(self):
         self.lengths = [self.EMPTY, self.ROOMY, self.LARGE, self.ROOMY, self.LARGE]
-        self.queues = [CircularQueue(self.CAPACITY) for i in range(len(self.lengths))]
+        self.queues = [self.make_queue() for i in range(len(self.lengths))]
         for queue, length in zip(self.queues, self.lengths):
             for i in range(length):
                 queue.append(i)
@@ -184,6 +373,103 @@ class TestQueue(unittest.TestCase):
             self.assertEqual(len(queue), 0)
             self.assertTrue(queue.is_empty())
 
+    def test_indexing(self):
+        for queue, length in zip(self.queues, self.lengths):
+            self.assertEqual(list(queue), list(range(length)))
+            for i in range(length):
+                self.assertEqual(queue[i], i)
+            self.assertRaises(IndexError, queue.__getitem__, length)
+            self.assertRaises(IndexError, queue.__getitem__, -1)
+            self.assertEqual(len(queue), length)
+        # wrapped around the end of the array
+        queue = CircularQueue(3)
+        for i in range(3):
+            queue.append(i)
+        queue.serve()
+        queue.append(3)
+        self.assertEqual(list(queue), [1, 2, 3])
+        self.assertEqual(queue[2], 3)
+
+class TestDynamicQueue(TestQueue):
+    """ Runs the above tests on the growing queue, plus growth itself. """
+
+    def make_queue(self) -> Queue[int]:
+        return DynamicCircularQueue()
+
+    def test_growth(self):
+        queue = DynamicCircularQueue()
+        for i in range(3):
+            queue.append(i)
+        queue.serve()
+        # wraps around the array before growing past it
+        for i in range(3, 2000):
+            queue.append(i)
+        self.assertEqual(len(queue), 1999)
+        self.assertEqual(queue.capacity, 2048)
+        for i in range(1, 2000):
+            self.assertEqual(queue.serve(), i)
+        self.assertEqual(queue.capacity, 1)
+
+    def test_shrinking(self):
+        queue = DynamicCircularQueue(8)
+        for i in range(100):
+            queue.append(i)
+        for i in range(70):
+            self.assertEqual(queue.serve(), i)
+        self.assertEqual((queue.capacity, queue.occupancy), (64, 30 / 64))
+        # hovering around a resize point does not resize again
+        for i in range(100, 110):
+            queue.append(i)
+            queue.serve()
+        self.assertEqual(queue.capacity, 64)
+        self.assertEqual(list(queue), list(range(80, 110)))
+        queue.clear()
+        self.assertEqual(queue.capacity, 8)
+
+class TestTypedQueue(TestQueue):
+    """ Runs the above tests on queues of unboxed integers. """
+
+    def make_queue(self) -> Queue[int]:
+        return CircularQueue(self.CAPACITY, 'i')
+
+    def test_typed_growth(self):
+        queue = ReversibleDeque(typecode='H')
+        for i in range(100):
+            queue.append(i)
+        queue.reverse()
+        self.assertEqual(queue.serve(), 99)
+        self.assertEqual(queue.array.typecode, 'H')
+        self.assertEqual(queue.array.to_numpy()[:3].tolist(), [0, 1, 2])
+
+class TestReversibleDeque(TestDynamicQueue):
+    """ Runs the above tests on the deque, plus both ends and reversal. """
+
+    def make_queue(self) -> Queue[int]:
+        return ReversibleDeque()
+
+    def test_reverse(self):
+        deque = ReversibleDeque()
+        expected = []
+        for i in range(50):
+            if i % 7 == 3:
+                deque.reverse()
+                expected.reverse()
+            if i % 5 == 4:
+                self.assertEqual(deque.serve(), expected.pop(0))
+            if i % 11 == 10:
+                self.assertEqual(deque.serve_rear(), expected.pop())
+            if i % 3 == 0:
+                deque.append_front(i)
+                expected.insert(0, i)
+            else:
+                deque.append(i)
+                expected.append(i)
+            self.assertEqual(list(deque), expected)
+            self.assertEqual(deque[len(expected) - 1], expected[-1])
+        deque.clear()
+        self.assertFalse(deque.reversed)
+        self.assertRaises(Exception, deque.serve_rear)
+
 if __name__ == '__main__':
     testtorun = TestQueue()
     suite = unittest.TestLoader().loadTestsFromModule(testtorun)
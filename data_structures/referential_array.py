@@ -13,6 +13,7 @@ Note that while I do check the precondition in __init__ (noone else
 would), I do not check that of getitem or setitem, since that is already
 checked by self.array[index].
 """
+from __future__ import annotations
 __author__ = "Julian Garcia for the __init__ code, Maria Garcia de la Banda for the rest"
 __docformat__ = 'reStructuredText'
 
@@ -30,7 +31,7 @@ class ArrayR(Generic[T]):
         if length <= 0:
             raise ValueError("Array length should be larger than 0.")
         self.array = (length * py_object)() # initialises the space
-        self.array[:] =  [None for _ in range(length)]
+        self.array[:] =  [None] * length
 
     def __len__(self) -> int:
         """ Returns the length of the array
@@ -51,3 +52,53 @@ class ArrayR(Generic[T]):
         :pre: index in between 0 and length - self.array[] checks it
         """
         self.array[index] = value
+
+    def copy_from(self, source: ArrayR[T], source_start: int, start: int, count: int) -> None:
+        """ Copies source[source_start:source_start + count] into self[start:start + count].
+        The block is copied by one ctypes slice assignment, which keeps the reference
+        counts right (a raw memmove of the references would not).
+        :complexity: O(count), in C
+        :pre: both ranges are inside their arrays
+        """
+        if count <= 0:
+            return
+        if source_start < 0 or source_start + count > len(source) or start < 0 or start + count > len(self):
+            raise IndexError("Copy out of the bounds of the array.")
+        self.array[start:start + count] = source.array[source_start:source_start + count]
+
+    def move(self, source_start: int, start: int, count: int) -> None:
+        """ Moves self[source_start:source_start + count] to start, even if the ranges overlap.
+        The moved block is read out in full before it is written.
+        :complexity: O(count), in C
+        :pre: both ranges are inside the array
+        """
+        self.copy_from(self, source_start, start, count)
+
+    def fill(self, value: T, start: int = 0, stop: int | None = None) -> None:
+        """ Sets every position in [start, stop) to value. stop defaults to the length.
+        :complexity: O(stop - start), in C
+        """
+        if stop is None:
+            stop = len(self)
+        if not 0 <= start <= stop <= len(self):
+            raise IndexError("Fill out of the bounds of the array.")
+        self.array[start:stop] = [value] * (stop - start)
+
+    def assign(self, values: list[T], start: int = 0) -> None:
+        """ Sets self[start:start + len(values)] to the values, in one slice assignment.
+        :complexity: O(len(values)), in C
+        :pre: the range is inside the array
+        """
+        if start < 0 or start + len(values) > len(self):
+            raise IndexError("Assign out of the bounds of the array.")
+        self.array[start:start + len(values)] = values
+
+    def to_list(self, start: int = 0, stop: int | None = None) -> list[T]:
+        """ The values in positions [start, stop), as a list. stop defaults to the length.
+        :complexity: O(stop - start), in C
+        """
+        if stop is None:
+            stop = len(self)
+        if not 0 <= start <= stop <= len(self):
+            raise IndexError("Slice out of the bounds of the array.")
+        return self.array[start:stop]
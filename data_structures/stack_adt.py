@@ -10,6 +10,7 @@ import unittest
 from abc import ABC, abstractmethod
 from typing import TypeVar, Generic
 from data_structures.referential_array import ArrayR, T
+from data_structures.typed_array import make_array
 
 class Stack(ABC, Generic[T]):
     def __init__(self) -> None:
@@ -53,23 +54,34 @@ class ArrayStack(Stack[T]):
 
     Attributes:
          length (int): number of elements in the stack (inherited)
-         array (ArrayR[T]): array storing the elements of the queue
+         array (ArrayR[T] | ArrayT): array storing the elements of the queue
 
     ArrayR cannot create empty arrays. So MIN_CAPACITY used to avoid this.
     """
     MIN_CAPACITY = 1
 
-    def __init__(self, max_capacity: int) -> None:
+    def __init__(self, max_capacity: int, typecode: str | None = None) -> None:
         """ Initialises the length and the array with the given capacity.
             If max_capacity is 0, the array is created with MIN_CAPACITY.
+            With an array.array typecode, the stack holds numbers of that type in an ArrayT.
         """
         Stack.__init__(self)
-        self.array = ArrayR(max(self.MIN_CAPACITY, max_capacity))
+        self.array = make_array(max(self.MIN_CAPACITY, max_capacity), typecode)
 
     def is_full(self) -> bool:
         """ True if the stack is full and no element can be pushed. """
         return len(self) == len(self.array)
 
+    @property
+    def capacity(self) -> int:
+        """ Number of elements the array has room for. """
+        return len(self.array)
+
+    @property
+    def occupancy(self) -> float:
+        """ Fraction of the array in use. """
+        return len(self) / len(self.array)
+
     def push(self, item: T) -> None:
         """ Pushes an element to the top of the stack.
         :pre: stack is not full
@@ -99,16 +111,67 @@ class ArrayStack(Stack[T]):
             raise Exception("Stack is empty")
         return self.array[self.length-1]
 
+class DynamicArrayStack(ArrayStack[T]):
+    """ Array stack that grows instead of becoming full, and shrinks when mostly empty.
+
+    The array doubles when a push finds it full, and halves when pops leave
+    it a quarter full, but never below the initial capacity. Growing and shrinking
+    at different occupancies means alternating push and pop never resize every time,
+    so both are amortised O(1).
+
+    Attributes:
+         initial_capacity (int): smallest capacity the array shrinks to
+    """
+    def __init__(self, initial_capacity: int = 1, typecode: str | None = None) -> None:
+        ArrayStack.__init__(self, initial_capacity, typecode)
+        self.initial_capacity = len(self.array)
+        self.typecode = typecode
+
+    def push(self, item: T) -> None:
+        """ Pushes an element to the top of the stack, growing the array if needed.
+        :complexity: O(1) amortised, O(n) when the array is resized
+        """
+        if len(self) == len(self.array):
+            self._resize(2 * len(self.array))
+        ArrayStack.push(self, item)
+
+    def pop(self) -> T:
+        """ Pops the element at the top of the stack, shrinking the array if it is a quarter full.
+        :pre: stack is not empty
+        :raises Exception: if the stack is empty
+        :complexity: O(1) amortised, O(n) when the array is resized
+        """
+        item = ArrayStack.pop(self)
+        if len(self) <= len(self.array) // 4 and len(self.array) > self.initial_capacity:
+            self._resize(max(self.initial_capacity, len(self.array) // 2))
+        return item
+
+    def is_full(self) -> bool:
+        """ The stack grows as needed, so it is never full. """
+        return False
+
+    def clear(self) -> None:
+        """ Clears all elements from the stack, and goes back to the initial capacity. """
+        ArrayStack.clear(self)
+        self.array = make_array(self.initial_capacity, self.typecode)
+
+    def _resize(self, capacity: int) -> None:
+        """ Copies the elements into a new array of the given capacity. """
+        new_array = make_array(capacity, self.typecode)
+        new_array.copy_from(self.array, 0, 0, len(self))
+        self.array = new_array
+
 class TestStack(unittest.TestCase):
     """ Tests for the above class."""
     EMPTY = 0
     ROOMY = 5
     LARGE = 10
     CAPACITY = 20
+    TYPECODE = None
 
     def setUp(self):
         self.lengths = [self.EMPTY, self.ROOMY, self.LARGE, self.ROOMY, self.LARGE]
-        self.stacks = [ArrayStack(self.CAPACITY) for i in range(len(self.lengths))]
+        self.stacks = [ArrayStack(self.CAPACITY, self.TYPECODE) for i in range(len(self.lengths))]
         for stack, length in zip(self.stacks, self.lengths):
             for i in range(length):
                 stack.push(i)
@@ -183,6 +246,45 @@ class TestStack(unittest.TestCase):
             self.assertEqual(len(stack), 0)
             self.assertTrue(stack.is_empty())
 
+class TestTypedStack(TestStack):
+    """ Runs the above tests on stacks of unboxed integers. """
+    TYPECODE = 'i'
+
+    def test_unboxed(self):
+        self.assertEqual(self.large_stack.array.nbytes, 4 * self.CAPACITY)
+        self.large_stack.push(-5)
+        self.assertEqual(self.large_stack.array.to_numpy()[self.LARGE], -5)
+
+class TestDynamicStack(TestStack):
+    """ Runs the above tests on the growing stack, plus growth and shrinking. """
+
+    def setUp(self):
+        TestStack.setUp(self)
+        self.stacks = [DynamicArrayStack() for i in range(len(self.lengths))]
+        for stack, length in zip(self.stacks, self.lengths):
+            for i in range(length):
+                stack.push(i)
+        self.empty_stack, self.roomy_stack, self.large_stack = self.stacks[:3]
+
+    def test_resizing(self):
+        stack = DynamicArrayStack(4)
+        for i in range(1000):
+            stack.push(i)
+        self.assertEqual(stack.capacity, 1024)
+        for i in range(999, 200, -1):
+            self.assertEqual(stack.pop(), i)
+        self.assertEqual(stack.capacity, 512)
+        # hovering around a resize point does not resize again
+        stack.push(0)
+        stack.pop()
+        self.assertEqual(stack.capacity, 512)
+        while not stack.is_empty():
+            stack.pop()
+        self.assertEqual(stack.capacity, 4)
+        stack.push(1)
+        stack.clear()
+        self.assertEqual((stack.capacity, stack.occupancy), (4, 0))
+
 if __name__ == '__main__':
     testtorun = TestStack()
     suite = unittest.TestLoader().loadTestsFromModule(testtorun)
@@ -0,0 +1,226 @@
+"""
+    Treap-based implementation of SortedList ADT.
+    Items to store should be of time ListItem.
+
+    Every node keeps the size of its subtree, so positions are found by
+    walking down the tree: add, delete_at_index, index and [] are O(log n)
+    expected, instead of the O(n) shuffles of ArraySortedList.
+    Also defines UnitTests for the class.
+"""
+
+from __future__ import annotations
+import random
+import unittest
+from data_structures.sorted_list_adt import *
+
+__docformat__ = 'reStructuredText'
+
+class TreapNode:
+    """ Node of a treap: a binary search tree by position, and a heap by priority. """
+    __slots__ = ('item', 'priority', 'left', 'right', 'size')
+
+    def __init__(self, item: ListItem) -> None:
+        self.item = item
+        self.priority = random.random()
+        self.left = None
+        self.right = None
+        self.size = 1
+
+    def update(self) -> None:
+        """ Recomputes the size after a child changed. """
+        self.size = 1 + size(self.left) + size(self.right)
+
+def size(node: TreapNode | None) -> int:
+    """ Number of items in the subtree. """
+    return node.size if node is not None else 0
+
+def split(node: TreapNode | None, count: int) -> tuple[TreapNode | None, TreapNode | None]:
+    """ Splits the subtree into its first count items and the rest. """
+    if node is None:
+        return None, None
+    if size(node.left) >= count:
+        left, node.left = split(node.left, count)
+        node.update()
+        return left, node
+    node.right, right = split(node.right, count - size(node.left) - 1)
+    node.update()
+    return node, right
+
+def merge(left: TreapNode | None, right: TreapNode | None) -> TreapNode | None:
+    """ Joins two subtrees, with every item of left placed before those of right. """
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        left.right = merge(left.right, right)
+        left.update()
+        return left
+    right.left = merge(left, right.left)
+    right.update()
+    return right
+
+class TreapSortedList(SortedList[T]):
+    """ SortedList ADT implemented with a treap.
+    Items with equal keys are kept in the order they were added.
+    """
+
+    def __init__(self, max_capacity: int = 1) -> None:
+        """ TreapSortedList object initialiser.
+        max_capacity is accepted for ArraySortedList compatibility; the tree has no capacity.
+        """
+        SortedList.__init__(self)
+        self.root = None
+
+    def reset(self):
+        """ Reset the list. """
+        self.clear()
+
+    def clear(self) -> None:
+        """ Clear the list. """
+        SortedList.clear(self)
+        self.root = None
+
+    def __getitem__(self, index: int) -> T:
+        """ Magic method. Return the element at a given position.
+        :raises IndexError: if there is no such position.
+        :complexity: O(log n) expected
+        """
+        if not 0 <= index < len(self):
+            raise IndexError('No such index in the list')
+        node = self.root
+        while True:
+            left = size(node.left)
+            if index < left:
+                node = node.left
+            elif index == left:
+                return node.item
+            else:
+                index -= left + 1
+                node = node.right
+
+    def __setitem__(self, index: int, item: ListItem) -> None:
+        """ Magic method. Insert the item at a given position,
+            if possible (!). The following elements move one position right.
+        :raises IndexError: if the item does not belong at that position.
+        :complexity: O(log n) expected
+        """
+        if not 0 <= index <= len(self) or \
+                (index > 0 and item.key < self[index - 1].key) or \
+                (index < len(self) and self[index].key < item.key):
+            raise IndexError('Element should be inserted in sorted order')
+        self._insert(index, item)
+
+    def __contains__(self, item: ListItem) -> bool:
+        """ Checks if value is in the list. """
+        try:
+            self.index(item)
+        except ValueError:
+            return False
+        return True
+
+    def add(self, item: ListItem) -> None:
+        """ Add new element to the list, after any with the same key.
+        :complexity: O(log n) expected
+        """
+        self._insert(self._count_at_most(item.key), item)
+
+    def delete_at_index(self, index: int) -> ListItem:
+        """ Delete item at a given position.
+        :complexity: O(log n) expected
+        """
+        if not 0 <= index < len(self):
+            raise IndexError('No such index in the list')
+        left, rest = split(self.root, index)
+        node, right = split(rest, 1)
+        self.root = merge(left, right)
+        self.length -= 1
+        return node.item
+
+    def index(self, item: ListItem) -> int:
+        """ Find the position of a given item in the list.
+        :complexity: O(log n) expected, plus O(log n) for every item with the same key before it.
+        """
+        pos = self._count_below(item.key)
+        while pos < len(self):
+            current = self[pos]
+            if current.key != item.key:
+                break
+            if current == item:
+                return pos
+            pos += 1
+        raise ValueError('item not in list')
+
+    def _insert(self, index: int, item: ListItem) -> None:
+        """ Places the item at the given position. """
+        left, right = split(self.root, index)
+        self.root = merge(merge(left, TreapNode(item)), right)
+        self.length += 1
+
+    def _count_below(self, key) -> int:
+        """ Number of items with a key smaller than the given one. """
+        count = 0
+        node = self.root
+        while node is not None:
+            if node.item.key < key:
+                count += size(node.left) + 1
+                node = node.right
+            else:
+                node = node.left
+        return count
+
+    def _count_at_most(self, key) -> int:
+        """ Number of items with a key no larger than the given one. """
+        count = 0
+        node = self.root
+        while node is not None:
+            if node.item.key <= key:
+                count += size(node.left) + 1
+                node = node.right
+            else:
+                node = node.left
+        return count
+
+
+class TestTreapSortedList(unittest.TestCase):
+    """ Tests for the above class, against a sorted Python list. """
+
+    def test_matches_sorted_list(self):
+        rng = random.Random(3)
+        treap = TreapSortedList()
+        expected = []
+        for i in range(2000):
+            if expected and rng.random() < 0.3:
+                position = rng.randrange(len(expected))
+                self.assertEqual(treap.delete_at_index(position), expected.pop(position))
+            else:
+                item = ListItem(i, rng.randrange(100))
+                treap.add(item)
+                # equal keys go after the ones already there
+                position = sum(1 for other in expected if other.key <= item.key)
+                expected.insert(position, item)
+            self.assertEqual(len(treap), len(expected))
+        self.assertEqual([treap[i] for i in range(len(treap))], expected)
+        for position in range(0, len(expected), 17):
+            self.assertEqual(treap.index(expected[position]), position)
+        self.assertNotIn(ListItem(-1, 5), treap)
+        self.assertRaises(ValueError, treap.index, ListItem(-1, 5))
+        self.assertRaises(IndexError, treap.__getitem__, len(expected))
+
+    def test_setitem(self):
+        treap = TreapSortedList(10)
+        for key in [1, 3, 5]:
+            treap.add(ListItem(str(key), key))
+        treap[1] = ListItem('2', 2)
+        self.assertEqual([treap[i].key for i in range(len(treap))], [1, 2, 3, 5])
+        with self.assertRaises(IndexError):
+            treap[0] = ListItem('9', 9)
+        treap.remove(ListItem('3', 3))
+        self.assertEqual(str(treap), '[(1, 1), (2, 2), (5, 5)]')
+        treap.clear()
+        self.assertTrue(treap.is_empty())
+        self.assertRaises(IndexError, treap.delete_at_index, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
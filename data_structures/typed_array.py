@@ -0,0 +1,162 @@
+""" Typed counterpart of ArrayR, for numeric elements.
+
+ArrayR holds a reference to a boxed Python object per position. ArrayT
+instead keeps the numbers themselves in a stdlib array.array, using the
+size of its typecode per position ('B' is 1 byte, 'H' 2, 'i' 4, 'd' 8),
+and exposes that memory without copying through view() and to_numpy().
+"""
+from __future__ import annotations
+__docformat__ = 'reStructuredText'
+
+from array import array
+import unittest
+import numpy as np
+from data_structures.referential_array import ArrayR
+
+class ArrayT:
+    def __init__(self, typecode: str, length: int) -> None:
+        """ Creates an array of the given array.array typecode and length, set to 0.
+        :complexity: O(length)
+        :pre: length > 0
+        :raises ValueError: if length is not positive or the typecode is unknown
+        """
+        if length <= 0:
+            raise ValueError("Array length should be larger than 0.")
+        self.typecode = typecode
+        self.array = array(typecode, bytes(length * array(typecode).itemsize))
+
+    def __len__(self) -> int:
+        """ Returns the length of the array
+        :complexity: O(1)
+        """
+        return len(self.array)
+
+    def __getitem__(self, index: int) -> int | float:
+        """ Returns the number in position index.
+        :complexity: O(1)
+        :pre: index in between 0 and length - self.array[] checks it
+        """
+        return self.array[index]
+
+    def __setitem__(self, index: int, value: int | float) -> None:
+        """ Sets the number in position index to value
+        :complexity: O(1)
+        :pre: index in between 0 and length - self.array[] checks it
+        :raises OverflowError: if value does not fit the typecode
+        """
+        self.array[index] = value
+
+    def copy_from(self, source: ArrayT, source_start: int, start: int, count: int) -> None:
+        """ Copies source[source_start:source_start + count] into self[start:start + count].
+        :complexity: O(count), as one block copy
+        :pre: both ranges are inside their arrays
+        """
+        if count <= 0:
+            return
+        if source_start < 0 or source_start + count > len(source) or start < 0 or start + count > len(self):
+            raise IndexError("Copy out of the bounds of the array.")
+        self.array[start:start + count] = source.array[source_start:source_start + count]
+
+    def move(self, source_start: int, start: int, count: int) -> None:
+        """ Moves self[source_start:source_start + count] to start, even if the ranges overlap.
+        :complexity: O(count), as one block copy
+        """
+        self.copy_from(self, source_start, start, count)
+
+    def fill(self, value: int | float, start: int = 0, stop: int | None = None) -> None:
+        """ Sets every position in [start, stop) to value. stop defaults to the length.
+        :complexity: O(stop - start)
+        """
+        if stop is None:
+            stop = len(self)
+        if not 0 <= start <= stop <= len(self):
+            raise IndexError("Fill out of the bounds of the array.")
+        self.array[start:stop] = array(self.typecode, [value]) * (stop - start)
+
+    def assign(self, values, start: int = 0) -> None:
+        """ Sets self[start:start + len(values)] to the values, as one block copy.
+        :complexity: O(len(values))
+        :pre: the range is inside the array
+        """
+        if start < 0 or start + len(values) > len(self):
+            raise IndexError("Assign out of the bounds of the array.")
+        self.array[start:start + len(values)] = array(self.typecode, values)
+
+    def to_list(self, start: int = 0, stop: int | None = None) -> list[int | float]:
+        """ The numbers in positions [start, stop), as a list. stop defaults to the length.
+        :complexity: O(stop - start)
+        """
+        if stop is None:
+            stop = len(self)
+        if not 0 <= start <= stop <= len(self):
+            raise IndexError("Slice out of the bounds of the array.")
+        return self.array[start:stop].tolist()
+
+    def view(self) -> memoryview:
+        """ A memoryview of the numbers, sharing their memory.
+        Writing through it changes the array.
+        :complexity: O(1)
+        """
+        return memoryview(self.array)
+
+    def to_numpy(self) -> np.ndarray:
+        """ A NumPy array sharing the memory of the numbers.
+        :complexity: O(1)
+        """
+        return np.frombuffer(self.array, dtype=self.array.typecode)
+
+    @property
+    def nbytes(self) -> int:
+        """ Bytes taken by the numbers. """
+        return len(self.array) * self.array.itemsize
+
+def make_array(length: int, typecode: str | None = None) -> ArrayR | ArrayT:
+    """ An ArrayR of the given length, or an ArrayT if a typecode is given.
+    Lets the stacks and queues hold numbers unboxed.
+    """
+    if typecode is None:
+        return ArrayR(length)
+    return ArrayT(typecode, length)
+
+
+class TestArrayT(unittest.TestCase):
+    """ Tests for the above class."""
+
+    def test_values(self):
+        array = ArrayT('H', 5)
+        self.assertEqual([array[i] for i in range(5)], [0] * 5)
+        array[1] = 65535
+        self.assertEqual(array[1], 65535)
+        self.assertRaises(OverflowError, array.__setitem__, 2, 65536)
+        self.assertRaises(IndexError, array.__getitem__, 5)
+        self.assertRaises(ValueError, ArrayT, 'H', 0)
+        self.assertEqual(array.nbytes, 10)
+
+    def test_blocks(self):
+        array = ArrayT('i', 6)
+        for i in range(4):
+            array[i] = i + 1
+        array.move(0, 2, 4)
+        self.assertEqual(list(array.array), [1, 2, 1, 2, 3, 4])
+        array.fill(-7, 4)
+        self.assertEqual(list(array.array), [1, 2, 1, 2, -7, -7])
+        other = ArrayT('i', 2)
+        other.copy_from(array, 3, 0, 2)
+        self.assertEqual(list(other.array), [2, -7])
+        array.assign([9, 8], 1)
+        self.assertEqual(array.to_list(0, 4), [1, 9, 8, 2])
+        self.assertRaises(IndexError, array.assign, [1, 2], 5)
+
+    def test_shared_memory(self):
+        array = ArrayT('d', 3)
+        numbers = array.to_numpy()
+        numbers[1] = 2.5
+        self.assertEqual(array[1], 2.5)
+        array.view()[2] = 4.0
+        self.assertEqual(numbers[2], 4.0)
+        self.assertIsInstance(make_array(3), ArrayR)
+        self.assertIsInstance(make_array(3, 'B'), ArrayT)
+
+
+if __name__ == '__main__':
+    unittest.main()
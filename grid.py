@@ -1,5 +1,10 @@
 from __future__ import annotations
+from dataclasses import dataclass, field
+import numpy as np
 from data_structures.referential_array import ArrayR
+from layer_store import LayerStore, SetLayerStore, AdditiveLayerStore, BitSequenceLayerStore
+from layer_util import Layer, fold_layers, fuse_layers, get_layers
+import layers
 
 class Grid:
     DRAW_STYLE_SET = "SET"
@@ -40,11 +45,61 @@ class Grid:
         self.y = y
         self.grid = ArrayR(x)
 
+        # Render cache: the last frame, the start colour it was made from,
+        # the squares changed since, and the layer sequence key of every painted square.
+        self.frame = np.empty((x, y, 3), dtype=np.uint8)
+        self.frame_start = None
+        self.dirty = set()
+        self.square_keys = {}
+        self.groups = {}
+
+        self.build()
+
+        self.brush_size = self.DEFAULT_BRUSH_SIZE # setting the brush size
+
+    def build(self) -> None:
+        """
+        Fills self.grid with a column array per x, holding a new store for every square.
+        """
         for i in range(self.x):
             self.grid[i] = ArrayR(self.y)  
+            for j in range(self.y):
+                self.grid[i][j] = self.track(self.new_store(), i, j)
 
-        self.brush_size = self.DEFAULT_BRUSH_SIZE # setting the brush size
+    def track(self, store: LayerStore, x: int, y: int) -> LayerStore:
+        """
+        Makes the store report its changes to this grid, as square (x, y).
+        """
+        store.dirty = self.dirty
+        store.position = (x, y)
+        return store
 
+    def squares(self):
+        """
+        Yields (x, y, store) for every square that has a store.
+        """
+        for i in range(self.x):
+            column = self.grid[i]
+            for j in range(self.y):
+                yield i, j, column[j]
+
+    def new_store(self) -> LayerStore:
+        """
+        Creates an empty LayerStore matching the draw style of the grid.
+        """
+        if self.draw_style == self.DRAW_STYLE_SET:
+            return SetLayerStore()
+        elif self.draw_style == self.DRAW_STYLE_ADD:
+            return AdditiveLayerStore()
+        elif self.draw_style == self.DRAW_STYLE_SEQUENCE:
+            return BitSequenceLayerStore()
+        raise ValueError(f"Unknown draw style {self.draw_style}")
+
+    def __getitem__(self, index: int) -> ArrayR[LayerStore]:
+        """
+        Returns the column of grid squares at x = index, so squares are grid[x][y].
+        """
+        return self.grid[index]
 
     def increase_brush_size(self):
         """
@@ -69,4 +124,536 @@ class Grid:
         """
         Activate the special affect on all grid squares.
         """
-        raise NotImplementedError()
\ No newline at end of file
+        for _, _, store in self.squares():
+            store.special()
+
+    def snapshot(self) -> dict[tuple[int, int], object]:
+        """
+        Returns the state of every store, by square, for restore.
+        :complexity: O(squares), plus the size of each store's state.
+        """
+        return {(i, j): store.snapshot() for i, j, store in self.squares()}
+
+    def restore(self, snapshot: dict[tuple[int, int], object], positions=None) -> None:
+        """
+        Brings the grid back to the state snapshot returned.
+        If positions is given, only those squares are restored, so it should hold
+        every square changed since the snapshot.
+        :complexity: O(squares restored), times the size of each store's state.
+        """
+        if positions is None:
+            positions = snapshot.keys()
+        for position in positions:
+            self.grid[position[0]][position[1]].restore(snapshot[position])
+
+    def take_dirty(self) -> list[tuple[int, int]]:
+        """
+        Removes and returns the squares changed since they were last taken.
+        Each is popped on its own, so a square another thread changes meanwhile
+        is either returned or left for the next call, never lost.
+        :complexity: O(changed squares)
+        """
+        positions = []
+        while self.dirty:
+            positions.append(self.dirty.pop())
+        return positions
+
+    def render(self, start, timestamp) -> np.ndarray:
+        """
+        Composites the colour of every grid square at the given timestamp.
+
+        Squares are grouped by the sequence of layers their store would apply,
+        after dropping layers that a later layer overwrites (see fold_layers).
+        Each layer is then applied once per group to the colours of all
+        of its squares together, instead of once per square.
+
+        Colours are cached between calls. A square is only recomputed when
+        add, erase or special changed it, or when one of its layers reads the timestamp
+        and has not declared (see layer_util.timing) that its output is still the same.
+        The returned array is that cache, so it must not be modified.
+
+        :return: (x, y, 3) uint8 array, where [i, j] is the colour of grid[i][j].
+        :complexity: O(changed squares + squares in animated groups), times the layers applied to each.
+        """
+        start = tuple(start[:3])
+        restart = start != self.frame_start
+        if restart:
+            # Every colour was computed from the old start, so recompute them all.
+            self.frame[:, :] = start
+            self.frame_start = start
+
+        changed = {}
+        for position in self.take_dirty():
+            sequence = fold_layers(self.grid[position[0]][position[1]].layer_sequence())
+            key = tuple(layer.index for layer in sequence)
+            old_key = self.square_keys.pop(position, ())
+            if old_key != key:
+                if old_key:
+                    self.groups[old_key].remove(position)
+                    if not self.groups[old_key].squares:
+                        del self.groups[old_key]
+                if key:
+                    if key not in self.groups:
+                        self.groups[key] = SquareGroup(sequence)
+                    self.groups[key].add(position)
+            if key:
+                self.square_keys[position] = key
+                changed.setdefault(key, []).append(position)
+            else:
+                self.frame[position] = start
+
+        for key, group in self.groups.items():
+            if not (restart or group.animated):
+                continue
+            expired = group.expired(timestamp) if group.animated else None
+            xs, ys = group.coordinates()
+            if restart or expired is None:
+                self.composite(group, timestamp, xs, ys)
+                changed.pop(key, None)
+            elif expired.any():
+                # Only squares whose layers reached a new phase can look different.
+                self.composite(group, timestamp, xs[expired], ys[expired])
+        for key, positions in changed.items():
+            xs = np.array([position[0] for position in positions])
+            ys = np.array([position[1] for position in positions])
+            self.composite(self.groups[key], timestamp, xs, ys)
+        return self.frame
+
+    def composite(self, group: SquareGroup, timestamp, xs: np.ndarray, ys: np.ndarray) -> None:
+        """
+        Applies the group's layers to the squares (xs[k], ys[k]), starting from the
+        start colour, and stores the results in the frame.
+        If no layer reads x or y, every square gets the same colour, so it is computed once.
+        """
+        n = len(xs) if group.positional else 1
+        colors = np.empty((n, 3), dtype=np.int64)
+        colors[:] = self.frame_start
+        for layer in group.fused:
+            colors = layer.apply_batch(colors, timestamp, xs[:n], ys[:n])
+        self.frame[xs, ys] = colors
+
+
+
+class SparseGrid(Grid):
+    """
+    A Grid that only creates the store of a square the first time it is painted.
+
+    Squares without a store show the start colour and are skipped by special,
+    rendering and squares(). grid[x][y] still works for every square:
+    for an unpainted one it gives an EmptySquare, which creates the store on use.
+    """
+
+    def build(self) -> None:
+        """
+        Fills self.grid with empty columns. Stores are kept in self.stores by (x, y).
+        """
+        self.stores = {}
+        # Number of times special was used. A new store has missed all of them.
+        self.specials = 0
+        for i in range(self.x):
+            self.grid[i] = SparseColumn(self, i)
+
+    def squares(self):
+        """
+        Yields (x, y, store) for every square that has been given a store.
+        """
+        for (i, j), store in self.stores.items():
+            yield i, j, store
+
+    def materialise(self, x: int, y: int) -> LayerStore:
+        """
+        Returns the store of square (x, y), creating it if needed.
+        A new store is given special once if it was used an odd number of times,
+        which leaves an empty store of every draw style the same as having had all of them.
+        """
+        store = self.stores.get((x, y))
+        if store is None:
+            store = self.new_store()
+            if self.specials % 2 == 1:
+                store.special()
+            store = self.track(store, x, y)
+            self.stores[(x, y)] = store
+        return store
+
+    def special(self):
+        """
+        Activate the special affect on all grid squares that have a store.
+        """
+        self.specials += 1
+        Grid.special(self)
+
+    def snapshot(self) -> tuple[int, dict[tuple[int, int], object]]:
+        """
+        Returns the number of specials, and the state of every store by square.
+        """
+        return self.specials, Grid.snapshot(self)
+
+    def restore(self, snapshot: tuple[int, dict[tuple[int, int], object]], positions=None) -> None:
+        """
+        Brings the grid back to the state snapshot returned.
+        Stores created since are removed again, so their squares show the start colour.
+        """
+        self.specials, states = snapshot
+        if positions is None:
+            positions = set(states) | set(self.stores)
+        for position in positions:
+            state = states.get(position)
+            if state is not None:
+                self.materialise(*position).restore(state)
+            elif position in self.stores:
+                del self.stores[position]
+                self.dirty.add(position)
+
+
+class SparseColumn:
+    """ Column x of a SparseGrid. """
+
+    def __init__(self, grid: SparseGrid, x: int) -> None:
+        self.grid = grid
+        self.x = x
+
+    def __len__(self) -> int:
+        return self.grid.y
+
+    def __getitem__(self, y: int) -> LayerStore | EmptySquare:
+        if not 0 <= y < self.grid.y:
+            raise IndexError("invalid index")
+        store = self.grid.stores.get((self.x, y))
+        if store is None:
+            return EmptySquare(self.grid, self.x, y)
+        return store
+
+
+class EmptySquare:
+    """
+    Stands in for the store of a SparseGrid square that has none.
+    Reading it shows the start colour. add and special create the real store and pass the call on.
+    """
+
+    def __init__(self, grid: SparseGrid, x: int, y: int) -> None:
+        self.grid = grid
+        self.x = x
+        self.y = y
+
+    def add(self, layer: Layer) -> bool:
+        return self.grid.materialise(self.x, self.y).add(layer)
+
+    def erase(self, layer: Layer) -> bool:
+        # Erasing leaves an empty store empty, so the square does not need a store.
+        # A throwaway store still gives the answer the real one would.
+        return self.grid.new_store().erase(layer)
+
+    def special(self):
+        return self.grid.materialise(self.x, self.y).special()
+
+    def get_color(self, start, timestamp, x, y) -> tuple[int, int, int]:
+        return start
+
+    def layer_sequence(self) -> tuple[Layer, ...]:
+        return ()
+
+
+
+class SetGrid(Grid):
+    """
+    A DRAW_STYLE_SET Grid holding the whole canvas in two arrays,
+    instead of a SetLayerStore per square:
+    - layer_indices[x, y] is the index of the square's layer in get_layers(), or NO_LAYER.
+    - inverted[x, y] is whether special is active on the square.
+
+    grid[x][y] gives a SetSquare, which works like a SetLayerStore on the arrays.
+    special and render are done on the arrays as a whole.
+    """
+
+    NO_LAYER = -1
+
+    def __init__(self, draw_style, x, y) -> None:
+        if draw_style != self.DRAW_STYLE_SET:
+            raise ValueError(f"SetGrid only supports {self.DRAW_STYLE_SET}, not {draw_style}")
+        Grid.__init__(self, draw_style, x, y)
+
+    def build(self) -> None:
+        """
+        Creates the arrays, with no layer and no special on any square.
+        """
+        self.layers = get_layers()
+        self.layer_indices = np.full((self.x, self.y), self.NO_LAYER, dtype=np.int8)
+        self.inverted = np.zeros((self.x, self.y), dtype=bool)
+        self.animated_indices = np.array(
+            [layer.index for layer in self.layers if layer is not None and layer.animated],
+            dtype=np.int8,
+        )
+        # Coordinates of the squares with an animated layer, found again after painting.
+        self.animated_squares = None
+        # phases[x, y] is the phase the square's layer had when it was last composited,
+        # or NaN if it has to be recomputed next time. Made on the first animated render.
+        self.phases = None
+        # Whether every square must be recomputed on the next render.
+        self.repaint = True
+        for i in range(self.x):
+            self.grid[i] = SetColumn(self, i)
+
+    def squares(self):
+        """
+        Yields (x, y, square) for every square.
+        """
+        for i in range(self.x):
+            for j in range(self.y):
+                yield i, j, SetSquare(self, i, j)
+
+    def special(self):
+        """
+        Activate the special affect on all grid squares.
+        """
+        np.logical_not(self.inverted, out=self.inverted)
+        self.repaint = True
+
+    def snapshot(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns copies of the two arrays.
+        """
+        return self.layer_indices.copy(), self.inverted.copy()
+
+    def restore(self, snapshot: tuple[np.ndarray, np.ndarray], positions=None) -> None:
+        """
+        Brings the grid back to the state snapshot returned,
+        copying only the given squares if positions is given.
+        """
+        layer_indices, inverted = snapshot
+        if positions is None:
+            self.layer_indices[:] = layer_indices
+            self.inverted[:] = inverted
+            self.repaint = True
+            return
+        positions = list(positions)
+        if positions:
+            xs, ys = np.array(positions).T
+            self.layer_indices[xs, ys] = layer_indices[xs, ys]
+            self.inverted[xs, ys] = inverted[xs, ys]
+            self.dirty.update(positions)
+
+    def render(self, start, timestamp) -> np.ndarray:
+        """
+        Composites the colour of every grid square at the given timestamp.
+        Works as Grid.render does, but squares are picked out of the arrays by layer.
+
+        Every square is recomputed after special or a new start colour.
+        Otherwise only painted squares are, and squares with an animated layer whose
+        phase (see layer_util.timing) has changed since, as SquareGroup.expired does.
+
+        :return: (x, y, 3) uint8 array, where [i, j] is the colour of grid[i][j].
+        :complexity: O(squares) after special or a new start, otherwise
+                     O(changed squares + animated squares), plus O(squares) after painting
+                     to find the animated squares again.
+                     Only squares whose phase changed have their layer applied.
+        """
+        start = tuple(start[:3])
+        repaint = self.repaint or start != self.frame_start
+        if repaint:
+            self.frame_start = start
+            self.repaint = False
+            # Cleared before the arrays are read, so a square painted meanwhile
+            # is either drawn now or marked dirty again for the next render.
+            self.dirty.clear()
+            self.animated_squares = None
+            xs, ys = np.indices((self.x, self.y))
+            self.composite_squares(xs.reshape(-1), ys.reshape(-1), timestamp)
+        else:
+            positions = self.take_dirty()
+            if positions:
+                xs = np.array([position[0] for position in positions])
+                ys = np.array([position[1] for position in positions])
+                self.animated_squares = None
+                self.composite_squares(xs, ys, timestamp)
+                if self.phases is not None:
+                    self.phases[xs, ys] = np.nan
+
+        if self.animated_squares is None:
+            self.animated_squares = np.nonzero(np.isin(self.layer_indices, self.animated_indices))
+        if len(self.animated_squares[0]):
+            xs, ys = self.animated_squares
+            if self.phases is None:
+                self.phases = np.full((self.x, self.y), np.nan)
+            phases = self.layer_phases(xs, ys, timestamp)
+            # NaN never equals itself, so undeclared phases always count as changed.
+            expired = phases != self.phases[xs, ys]
+            self.phases[xs, ys] = phases
+            if not repaint and expired.any():
+                self.composite_squares(xs[expired], ys[expired], timestamp)
+        return self.frame
+
+    def layer_phases(self, xs: np.ndarray, ys: np.ndarray, timestamp) -> np.ndarray:
+        """
+        The phase of the layer on each square (xs[k], ys[k]) at timestamp,
+        or NaN where the layer does not declare one.
+        """
+        indices = self.layer_indices[xs, ys]
+        phases = np.full(len(xs), np.nan)
+        for index in np.unique(indices).tolist():
+            layer = self.layers[index]
+            if layer.phase is None:
+                continue
+            chosen = indices == index
+            phases[chosen] = np.broadcast_to(layer.phase(timestamp, xs[chosen], ys[chosen]), xs[chosen].shape)
+        return phases
+
+    def composite_squares(self, xs: np.ndarray, ys: np.ndarray, timestamp) -> None:
+        """
+        Applies the layer of each square (xs[k], ys[k]) to the start colour,
+        inverts it if special is active there, and stores the results in the frame.
+        """
+        indices = self.layer_indices[xs, ys]
+        colors = np.empty((len(xs), 3), dtype=np.int64)
+        colors[:] = self.frame_start
+        for index in np.unique(indices).tolist():
+            if index == self.NO_LAYER:
+                continue
+            chosen = indices == index
+            colors[chosen] = self.layers[index].apply_batch(colors[chosen], timestamp, xs[chosen], ys[chosen])
+        # Like SetLayerStore, special does not change an empty square.
+        flip = (indices != self.NO_LAYER) & self.inverted[xs, ys]
+        colors[flip] = 255 - colors[flip]
+        self.frame[xs, ys] = colors
+
+
+class SetColumn:
+    """ Column x of a SetGrid. """
+
+    def __init__(self, grid: SetGrid, x: int) -> None:
+        self.grid = grid
+        self.x = x
+
+    def __len__(self) -> int:
+        return self.grid.y
+
+    def __getitem__(self, y: int) -> SetSquare:
+        if not 0 <= y < self.grid.y:
+            raise IndexError("invalid index")
+        return SetSquare(self.grid, self.x, y)
+
+
+class SetSquare(LayerStore):
+    """
+    Square (x, y) of a SetGrid. Behaves as a SetLayerStore,
+    keeping its layer and special status in the grid's arrays.
+    """
+
+    def __init__(self, grid: SetGrid, x: int, y: int) -> None:
+        self.grid = grid
+        self.x = x
+        self.y = y
+        self.dirty = grid.dirty
+        self.position = (x, y)
+
+    @property
+    def layer(self) -> Layer | None:
+        index = int(self.grid.layer_indices[self.x, self.y])
+        if index == SetGrid.NO_LAYER:
+            return None
+        return self.grid.layers[index]
+
+    @property
+    def special_active(self) -> bool:
+        return bool(self.grid.inverted[self.x, self.y])
+
+    def add(self, layer: Layer) -> bool:
+        if not 0 <= layer.index < len(self.grid.layers) or self.grid.layers[layer.index] is not layer:
+            raise ValueError(f"{layer.name} is not a registered layer")
+        self.grid.layer_indices[self.x, self.y] = layer.index
+        self.mark_dirty()
+        return True
+
+    def erase(self, layer: Layer) -> bool:
+        self.grid.layer_indices[self.x, self.y] = SetGrid.NO_LAYER
+        self.mark_dirty()
+        return True
+
+    def special(self):
+        self.grid.inverted[self.x, self.y] = not self.special_active
+        self.mark_dirty()
+
+    def get_color(self, start, timestamp, x, y) -> tuple[int, int, int]:
+        layer = self.layer
+        if layer is None:
+            return start
+        color = layer.apply(start, timestamp, x, y)
+        if self.special_active:
+            return tuple(255 - c for c in color)
+        return color
+
+    def layer_sequence(self) -> tuple[Layer, ...]:
+        layer = self.layer
+        if layer is None:
+            return ()
+        elif self.special_active:
+            return (layer, layers.invert)
+        return (layer, )
+
+    def snapshot(self) -> tuple[int, bool]:
+        return int(self.grid.layer_indices[self.x, self.y]), self.special_active
+
+    def restore(self, state: tuple[int, bool]) -> None:
+        self.grid.layer_indices[self.x, self.y], self.grid.inverted[self.x, self.y] = state
+        self.mark_dirty()
+
+
+@dataclass
+class SquareGroup:
+    """
+    The grid squares whose stores apply the same sequence of layers.
+    fused is that sequence with runs of lookup layers made into one table (see fuse_layers).
+    animated and positional are whether any of those layers reads the timestamp, or x or y.
+    """
+
+    sequence: tuple[Layer, ...]
+    fused: tuple[Layer, ...] = field(init=False)
+    animated: bool = field(init=False)
+    positional: bool = field(init=False)
+    squares: set[tuple[int, int]] = field(default_factory=set)
+    xs: np.ndarray | None = None
+    ys: np.ndarray | None = None
+    phases: np.ndarray | None = None
+
+    def __post_init__(self):
+        self.fused = fuse_layers(self.sequence)
+        self.animated = any(layer.animated for layer in self.sequence)
+        self.positional = any(layer.positional for layer in self.sequence)
+
+    def add(self, position: tuple[int, int]) -> None:
+        self.squares.add(position)
+        self.xs = self.ys = self.phases = None
+
+    def remove(self, position: tuple[int, int]) -> None:
+        self.squares.discard(position)
+        self.xs = self.ys = self.phases = None
+
+    def coordinates(self) -> tuple[np.ndarray, np.ndarray]:
+        """ The x and y arrays of the squares, rebuilt only after the group changes. """
+        if self.xs is None:
+            self.xs = np.array([position[0] for position in self.squares])
+            self.ys = np.array([position[1] for position in self.squares])
+        return self.xs, self.ys
+
+    def expired(self, timestamp) -> np.ndarray | None:
+        """
+        Which squares may have changed colour since the previous call, as a boolean
+        array in the order of coordinates(), or None if they all have to be recomputed.
+
+        A square is unchanged while every animated layer gives it the same phase as it had last time.
+        """
+        xs, ys = self.coordinates()
+        phases = []
+        for layer in self.sequence:
+            if not layer.animated:
+                continue
+            if layer.phase is not None:
+                phases.append(np.broadcast_to(layer.phase(timestamp, xs, ys), xs.shape))
+            else:
+                self.phases = None
+                return None
+        phases = np.stack(phases)
+        previous = self.phases
+        self.phases = phases
+        if previous is None:
+            return None
+        return (phases != previous).any(axis=0)
@@ -1,17 +1,31 @@
 from __future__ import annotations
 from abc import ABC, abstractmethod
-from layer_util import Layer
+from layer_util import Layer, fold_layers, fuse_layers, get_layers
+import layer_util
 import layers
-from data_structures.stack_adt import ArrayStack
-from data_structures.queue_adt import CircularQueue
+from data_structures.bset import BSet
+from data_structures.queue_adt import ReversibleDeque
 from data_structures.array_sorted_list import ArraySortedList
-from data_structures.sorted_list_adt import ListItem
+from data_structures.sorted_list_adt import ListItem, SortedList
 
 class LayerStore(ABC):
 
+    # The set of changed squares of the Grid owning this store, and this store's square.
+    # Both are set by the Grid; a store on its own has nothing to report changes to.
+    dirty: set[tuple[int, int]] | None = None
+    position: tuple[int, int] | None = None
+
     def __init__(self) -> None:
         pass
 
+    def mark_dirty(self) -> None:
+        """
+        Records that add, erase or special changed this store,
+        so the owning Grid recomputes the colour of its square.
+        """
+        if self.dirty is not None:
+            self.dirty.add(self.position)
+
     @abstractmethod
     def add(self, layer: Layer) -> bool:
         """
@@ -42,6 +56,29 @@ class LayerStore(ABC):
         """
         pass
 
+    @abstractmethod
+    def layer_sequence(self) -> tuple[Layer, ...]:
+        """
+        Returns the layers get_color would apply, in the order it would apply them.
+        Used by Grid to composite many squares sharing the same layers at once.
+        """
+        pass
+
+    @abstractmethod
+    def snapshot(self) -> object:
+        """
+        Returns what restore needs to bring the store back to its current state.
+        Later changes to the store must not change the returned value.
+        """
+        pass
+
+    @abstractmethod
+    def restore(self, state: object) -> None:
+        """
+        Brings the store back to the state snapshot returned.
+        """
+        pass
+
 class SetLayerStore(LayerStore):
     """
     Set layer store. A single layer can be stored at a time (or nothing at all)
@@ -78,6 +115,7 @@ class SetLayerStore(LayerStore):
         """
 
         self.layer = layer
+        self.mark_dirty()
         return True 
     
     
@@ -95,6 +133,7 @@ class SetLayerStore(LayerStore):
         """        
 
         self.layer = None
+        self.mark_dirty()
         return True
 
         
@@ -116,6 +155,7 @@ class SetLayerStore(LayerStore):
 
         else:
             self.special_active = False
+        self.mark_dirty()
 
     
     def get_color(self, start, timestamp, x, y) -> tuple[int, int, int]:
@@ -150,6 +190,51 @@ class SetLayerStore(LayerStore):
         #if the user didnt activate special, just return the original conditions
         else: 
             return cur_color.apply(start, timestamp, x, y)
+
+    def layer_sequence(self) -> tuple[Layer, ...]:
+
+        """
+
+        The single layer, followed by the invert layer when special is active.
+        An empty store shows start untouched, so special has no effect on it.
+
+        output: tuple of layers
+
+        :complexity: O(1)
+
+        """
+
+        if self.layer is None:
+            return ()
+        elif self.special_active is True:
+            return (self.layer, layers.invert)
+        else:
+            return (self.layer, )
+
+    def snapshot(self) -> tuple[Layer | None, bool]:
+
+        """
+
+        the layer and whether special is active.
+
+        :complexity: O(1)
+
+        """
+
+        return (self.layer, self.special_active)
+
+    def restore(self, state: tuple[Layer | None, bool]) -> None:
+
+        """
+
+        sets the layer and special status back to those snapshot gave.
+
+        :complexity: O(1)
+
+        """
+
+        self.layer, self.special_active = state
+        self.mark_dirty()
     
 
 
@@ -169,21 +254,35 @@ class AdditiveLayerStore(LayerStore):
 
         """
 
-        Initialises a circualr queue, arraystack with the length of 1000. 
-        This is because the length requirements are over 999.
+        Initialises a circular queue that starts with a single slot and
+        doubles whenever it fills up, so there is no limit on the number of layers
+        and an unpainted square holds almost nothing.
 
         circular queue was selected as it provides flexibility in length and memory use.
-        array stack was selected as a suitable container to reverse the element order.
+        it can also be reversed in place, which is all special needs.
 
 
         :complexity: O(1)
         
         """
  
-        # use circular queue and array stack
-        self.queue_A = CircularQueue(1000)
-        self.stack_A = ArrayStack(1000) #set limitations
+        # use a growing, reversible circular queue
+        self.queue_A = ReversibleDeque()
         self.isspecial = False
+        self.fused = None # layers get_color applies, rebuilt after any change
+
+    def mark_dirty(self) -> None:
+
+        """
+
+        The layers changed, so the fused layers have to be rebuilt on the next get_color.
+
+        :complexity: O(1)
+
+        """
+
+        self.fused = None
+        LayerStore.mark_dirty(self)
 
 
     def add(self, layer: Layer)->bool: 
@@ -199,6 +298,7 @@ class AdditiveLayerStore(LayerStore):
         """
      
         self.queue_A.append(layer)
+        self.mark_dirty()
 
         return True
 
@@ -216,58 +316,98 @@ class AdditiveLayerStore(LayerStore):
         
         """
         self.queue_A.serve() #removing the "oldest" element in the queue
+        self.mark_dirty()
     
         return True
     
     def get_color(self, start, timestamp, x, y) -> tuple[int, int, int]:
         """
 
-        checks if special has been activated 
+        applies the layers in order over start.
+        the fused layers are kept until the next add, erase or special.
 
         input: reference to instances (self)
 
         output: tuple[int, int, int] : original layer, reversed layer.
 
-        :complexity: O(n)
+        :complexity: O(n) after a change, otherwise O(m) for the m fused layers
         
         """
 
-        if not self.queue_A.is_empty(): #checks colour existance
-            current = start
-            for i in range(0, len(self.queue_A)):
-                new_lay = self.queue_A.serve()
-                current = new_lay.apply(current, timestamp, x, y) # produce colour 
-                self.queue_A.append(new_lay)
-            return current
-        return start
+        if self.fused is None:
+            # layers overwritten by a later one are dropped, and runs of
+            # colour only layers such as lighten / invert become one table lookup.
+            self.fused = fuse_layers(fold_layers(self.layer_sequence()))
+
+        current = start
+        for new_lay in self.fused:
+            current = new_lay.apply(current, timestamp, x, y) # produce colour 
+        return current
        
 
     def special(self)-> bool:
 
         """
 
-        reverses the order of current layers with the use of ciruclar queue and stack.
-        The logic involves: push the elements from the queue to stack and dequeue 
+        reverses the order of current layers.
+        The deque only flips which end is its front, so nothing is moved.
 
         input: reference to instances (self)
 
         output: boolean
 
-        :complexity: O(n)
+        :complexity: O(1)
         
         """
-        queue_len = len(self.queue_A)  
-        stack_len = len(self.queue_A) 
 
-        for i in range(0, queue_len):
-            self.stack_A.push(self.queue_A.serve())
+        self.queue_A.reverse()
 
-        for i in range(0, stack_len):
-            self.queue_A.append(self.stack_A.pop())
-        
         self.isspecial = True
+        self.mark_dirty()
         return True
 
+    def layer_sequence(self) -> tuple[Layer, ...]:
+
+        """
+
+        Reads the layers from front to rear of the circular queue, without changing it.
+
+        output: tuple of layers
+
+        :complexity: O(n)
+
+        """
+
+        return tuple(self.queue_A)
+
+    def snapshot(self) -> tuple[tuple[Layer, ...], bool]:
+
+        """
+
+        the layers from front to rear, and whether special was used.
+
+        :complexity: O(n)
+
+        """
+
+        return (tuple(self.queue_A), self.isspecial)
+
+    def restore(self, state: tuple[tuple[Layer, ...], bool]) -> None:
+
+        """
+
+        refills a new queue with the layers snapshot gave, in the same order.
+
+        :complexity: O(n)
+
+        """
+
+        applied, self.isspecial = state
+        self.queue_A = ReversibleDeque()
+        for layer in applied:
+            self.queue_A.append(layer)
+        self.mark_dirty()
+
 class SequenceLayerStore(LayerStore):
     """
     Sequential layer store. Each layer type is either applied / not applied, and is applied in order of index.
@@ -278,21 +418,23 @@ class SequenceLayerStore(LayerStore):
         In the event of two layers being the median names, pick the lexicographically smaller one.
     """
 
-    def __init__(self) -> None:
+    def __init__(self, list_class: type[SortedList] = ArraySortedList) -> None:
         """
 
-        initialising arraysorted list with the length of 1000
-        initialising another arraysorted list with the length of 1000
+        initialising arraysorted list with a single slot
+        initialising another arraysorted list with a single slot
+        -> both double their arrays when full, so they only grow as layers are applied.
         -> array sorted list provides automatic soring system which makes it easier for special to be implemented. 
+        -> list_class can be any other SortedList taking a capacity, such as TreapSortedList.
 
-        input: reference to instances (self)
+        input: reference to instances (self), sorted list class
 
         :complexity: O(1)
 
         """
         
-        self.srt_list = ArraySortedList(1000)
-        self.lexi_list = ArraySortedList(1000) 
+        self.srt_list = list_class(1)
+        self.lexi_list = list_class(1) 
         
     
     def add(self, layer: Layer) -> bool:
@@ -315,6 +457,7 @@ class SequenceLayerStore(LayerStore):
 
             l_item = ListItem(layer, layer.name)
             self.lexi_list.add(l_item)
+            self.mark_dirty()
             return True 
 
         else:
@@ -340,6 +483,7 @@ class SequenceLayerStore(LayerStore):
             l_item = ListItem(layer, layer.index)  
             lex_idx = self.lexi_list.index(l_item)
             self.lexi_list.delete_at_index(lex_idx)
+            self.mark_dirty()
 
             return True
         
@@ -369,6 +513,9 @@ class SequenceLayerStore(LayerStore):
         :complexity: O(1)
         
         """
+
+        if self.srt_list.is_empty(): # no applied layers, nothing to remove
+            return
     
         mid = (len(self.srt_list) // 2) #getting a mid value
 
@@ -406,4 +553,234 @@ class SequenceLayerStore(LayerStore):
                 
             return current
 
-        return start
\ No newline at end of file
+        return start
+
+    def layer_sequence(self) -> tuple[Layer, ...]:
+
+        """
+
+        The applied layers in order of index, as held by the sorted list.
+
+        output: tuple of layers
+
+        :complexity: O(n)
+
+        """
+
+        sequence = ()
+        for i in range(0, len(self.srt_list)):
+            sequence += (self.srt_list[i].value, )
+        return sequence
+
+    def snapshot(self) -> tuple[tuple[ListItem, ...], tuple[ListItem, ...]]:
+
+        """
+
+        the items of both sorted lists, in order.
+
+        :complexity: O(n)
+
+        """
+
+        return (
+            tuple(self.srt_list[i] for i in range(len(self.srt_list))),
+            tuple(self.lexi_list[i] for i in range(len(self.lexi_list))),
+        )
+
+    def restore(self, state: tuple[tuple[ListItem, ...], tuple[ListItem, ...]]) -> None:
+
+        """
+
+        refills new sorted lists, of the same class, with the items snapshot gave.
+
+        :complexity: O(n) adds
+
+        """
+
+        for name, items in zip(("srt_list", "lexi_list"), state):
+            sorted_list = type(getattr(self, name))(1)
+            for item in items:
+                sorted_list.add(item)
+            setattr(self, name, sorted_list)
+        self.mark_dirty()
+
+# Every registered layer's position in order of name, and the index of the layer at each position.
+# Rebuilt when more layers are registered, which should happen before any store is used.
+_name_ranks: tuple[tuple[int, ...], tuple[int, ...]] = ((), ())
+
+def name_ranks() -> tuple[tuple[int, ...], tuple[int, ...]]:
+    """
+    Returns (ranks, indices): ranks[i] is the position of the layer with index i
+    when all registered layers are sorted by name, and indices[r] is the index of the layer at position r.
+
+    :complexity: O(1), or O(L log L) for the L registered layers when one was registered since the last call.
+    """
+    global _name_ranks
+    registry = get_layers()
+    if len(_name_ranks[0]) != layer_util.cur_layer_index:
+        indices = tuple(sorted(range(layer_util.cur_layer_index), key=lambda i: registry[i].name))
+        ranks = [0] * len(indices)
+        for rank, index in enumerate(indices):
+            ranks[index] = rank
+        _name_ranks = (tuple(ranks), indices)
+    return _name_ranks
+
+class BitSequenceLayerStore(LayerStore):
+    """
+    Sequential layer store, keeping which layers are applied as bits.
+    Works like SequenceLayerStore, for layers registered with get_layers().
+    - add: Ensure this layer type is applied.
+    - erase: Ensure this layer type is not applied.
+    - special:
+        Of all currently applied layers, remove the one with median `name`.
+        In the event of two layers being the median names, pick the lexicographically smaller one.
+    """
+
+    def __init__(self) -> None:
+
+        """
+
+        applied holds index + 1 of every applied layer, since BSet items start at 1.
+        by_name holds the same layers by their position in order of name, plus 1 (see name_ranks).
+        Layers are applied in order of index, which is the order of the set bits of applied.
+
+        :complexity: O(1)
+
+        """
+
+        self.applied = BSet()
+        self.by_name = BSet()
+        self.fused = None # layers get_color applies, rebuilt after any change
+
+    def mark_dirty(self) -> None:
+
+        """
+
+        The layers changed, so the fused layers have to be rebuilt on the next get_color.
+
+        :complexity: O(1)
+
+        """
+
+        self.fused = None
+        LayerStore.mark_dirty(self)
+
+    def add(self, layer: Layer) -> bool:
+
+        """
+
+        sets the bits of the layer in both sets.
+
+        input: reference to instances (self), layer
+        output: boolean, False if the layer was already applied
+
+        :raises ValueError: if the layer is not registered
+        :complexity: O(1)
+
+        """
+
+        if not 0 <= layer.index < layer_util.cur_layer_index or get_layers()[layer.index] is not layer:
+            raise ValueError(f"{layer.name} is not a registered layer")
+        if layer.index + 1 in self.applied:
+            return False
+        self.applied.add(layer.index + 1)
+        self.by_name.add(name_ranks()[0][layer.index] + 1)
+        self.mark_dirty()
+        return True
+
+    def erase(self, layer: Layer) -> bool:
+
+        """
+
+        clears the bits of the layer in both sets.
+
+        input: reference to instances (self), layer
+        output: boolean, False if the layer was not applied
+
+        :complexity: O(1)
+
+        """
+
+        if layer.index < 0 or layer.index + 1 not in self.applied:
+            return False
+        self.applied.remove(layer.index + 1)
+        self.by_name.remove(name_ranks()[0][layer.index] + 1)
+        self.mark_dirty()
+        return True
+
+    def special(self):
+
+        """
+
+        removes the applied layer with median name.
+        by_name has one element per applied layer in order of name, so the median
+        is its ((n - 1) // 2)-th smallest. For an even n that is the smaller of the two.
+
+        :complexity: O(log L) popcounts for the L registered layers
+
+        """
+
+        count = len(self.applied)
+        if count == 0: # no applied layers, nothing to remove
+            return
+        rank = self.by_name.select((count - 1) // 2) - 1
+        self.erase(get_layers()[name_ranks()[1][rank]])
+
+    def get_color(self, start, timestamp, x, y) -> tuple[int, int, int]:
+
+        """
+
+        applies the applied layers in order of index over start.
+        the fused layers are kept until the next add, erase or special.
+
+        :complexity: O(L) after a change, otherwise O(m) for the m fused layers
+
+        """
+
+        if self.fused is None:
+            self.fused = fuse_layers(fold_layers(self.layer_sequence()))
+
+        current = start
+        for layer in self.fused:
+            current = layer.apply(current, timestamp, x, y)
+        return current
+
+    def layer_sequence(self) -> tuple[Layer, ...]:
+
+        """
+
+        The applied layers in order of index, one per element of applied.
+
+        output: tuple of layers
+
+        :complexity: O(n) for the n applied layers
+
+        """
+
+        registry = get_layers()
+        return tuple(registry[item - 1] for item in self.applied)
+
+    def snapshot(self) -> tuple[int, int]:
+
+        """
+
+        the bits of both sets.
+
+        :complexity: O(1)
+
+        """
+
+        return (self.applied.elems, self.by_name.elems)
+
+    def restore(self, state: tuple[int, int]) -> None:
+
+        """
+
+        sets the bits of both sets back to those snapshot gave.
+
+        :complexity: O(1)
+
+        """
+
+        self.applied.elems, self.by_name.elems = state
+        self.mark_dirty()
@@ -6,11 +6,19 @@ No need to edit unless adding new features.
 
 from __future__ import annotations
 from dataclasses import dataclass, field
+import numpy as np
 from data_structures.referential_array import ArrayR
 
 LAYERS: ArrayR[Layer] = ArrayR(20)
 cur_layer_index = 0
 
+# The arguments a layer's output can depend on, beyond which layer it is.
+COLOR = "color"
+TIMESTAMP = "timestamp"
+X = "x"
+Y = "y"
+INPUTS = frozenset((COLOR, TIMESTAMP, X, Y))
+
 @dataclass
 class Layer:
 
@@ -18,12 +26,56 @@ class Layer:
     apply: function
     name: str = field(init=False)
     bg: tuple[int, int, int] | None = None
+    batch: function | None = None
+    reads: frozenset[str] = INPUTS
+    channelwise: bool = False
+    phase: function | None = None
 
     def __post_init__(self):
         if hasattr(self.apply, "__bg__"):
             self.bg = self.apply.__bg__
+        if hasattr(self.apply, "__batch__"):
+            self.batch = self.apply.__batch__
+        if hasattr(self.apply, "__reads__"):
+            self.reads = self.apply.__reads__
+        if hasattr(self.apply, "__channelwise__"):
+            self.channelwise = self.apply.__channelwise__
+        if hasattr(self.apply, "__timing__"):
+            self.phase = self.apply.__timing__
         self.name = self.apply.__name__
 
+    @property
+    def animated(self) -> bool:
+        """ Whether the output can change with the timestamp alone. """
+        return TIMESTAMP in self.reads
+
+    @property
+    def positional(self) -> bool:
+        """ Whether the output can differ between squares given the same colour. """
+        return X in self.reads or Y in self.reads
+
+    @property
+    def lookup(self) -> bool:
+        """ Whether the layer is a fixed map from 0-255 to 0-255 on each channel. """
+        return self.channelwise and self.reads == frozenset((COLOR, ))
+
+    def apply_batch(self, colors: np.ndarray, timestamp, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+        """
+        Applies the layer to many squares at once.
+
+        colors is an (n, 3) integer array where row k is the colour of square (xs[k], ys[k]).
+        Returns a new (n, 3) int64 array of the resulting colours.
+        Uses the layer's batch kernel if it has one, otherwise calls apply once per square.
+        """
+        if len(colors) == 0:
+            return np.zeros((0, 3), dtype=np.int64)
+        if self.batch is not None:
+            return self.batch(colors, timestamp, xs, ys)
+        result = np.empty((len(colors), 3), dtype=np.int64)
+        for k, (color, x, y) in enumerate(zip(colors.tolist(), xs.tolist(), ys.tolist())):
+            result[k] = self.apply(tuple(color), timestamp, x, y)
+        return result
+
 class background(object):
     """Simple decorator to add a __bg__ property to a layer
 
@@ -43,6 +95,114 @@ class background(object):
         func.__bg__ = self.val
         return layer
 
+class batch(object):
+    """Simple decorator to add a vectorized __batch__ kernel to a layer
+
+    The kernel takes the same arguments as Layer.apply_batch and
+    must give the same colours as the layer itself, square for square.
+
+    Usage:  @register
+            @batch(my_special_layer_batch)
+            def my_special_layer(...):
+    """
+    def __init__(self, kernel):
+        self.kernel = kernel
+
+    def __call__(self, layer: function|Layer):
+        # This could be applied before or after registration
+        if isinstance(layer, Layer):
+            func = layer.apply
+            layer.batch = self.kernel
+        else:
+            func = layer
+        func.__batch__ = self.kernel
+        return layer
+
+class reads(object):
+    """Simple decorator to add a __reads__ property to a layer
+
+    Declares which of color, timestamp, x and y the layer's output depends on.
+    Layers without it are assumed to depend on all of them.
+
+    Usage:  @register
+            @reads("color", "x")
+            def my_special_layer(...):
+    """
+    def __init__(self, *inputs: str):
+        for name in inputs:
+            if name not in INPUTS:
+                raise ValueError(f"Layers can only read {sorted(INPUTS)}, not {name!r}")
+        self.val = frozenset(inputs)
+
+    def __call__(self, layer: function|Layer):
+        # This could be applied before or after registration
+        if isinstance(layer, Layer):
+            func = layer.apply
+            layer.reads = self.val
+        else:
+            func = layer
+        func.__reads__ = self.val
+        return layer
+
+class channelwise(object):
+    """Simple decorator to add a __channelwise__ property to a layer
+
+    Declares that each output channel only depends on the same input channel,
+    so a layer that only reads color can be replaced by a table per channel.
+
+    Usage:  @register
+            @channelwise()
+            @reads("color")
+            def my_special_layer(...):
+    """
+    def __call__(self, layer: function|Layer):
+        # This could be applied before or after registration
+        if isinstance(layer, Layer):
+            func = layer.apply
+            layer.channelwise = True
+        else:
+            func = layer
+        func.__channelwise__ = True
+        return layer
+
+class timing(object):
+    """Simple decorator to add a __timing__ property to a layer
+
+    Declares how often the output of a layer reading the timestamp actually changes,
+    so rendering can keep its last colours until then.
+    - phase(timestamp, xs, ys): given the same colour, x and y,
+        the output is the same for any timestamps with the same phase.
+        Must accept arrays of x and y as well as single values, and return numbers.
+    A layer whose output only changes every `step` seconds can use timestamp // step.
+
+    Usage:  @register
+            @timing(phase=lambda timestamp, x, y: (timestamp + x) // 2)
+            def my_special_layer(...):
+    """
+    def __init__(self, phase: function):
+        self.val = phase
+
+    def __call__(self, layer: function|Layer):
+        # This could be applied before or after registration
+        if isinstance(layer, Layer):
+            func = layer.apply
+            layer.phase = self.val
+        else:
+            func = layer
+        func.__timing__ = self.val
+        return layer
+
+def fold_layers(sequence: tuple[Layer, ...]) -> tuple[Layer, ...]:
+    """
+    Drops the layers whose output is overwritten regardless.
+    A layer that does not read color gives the same output whatever was applied before it,
+    so only the layers from the last such layer onwards change the final colour.
+    """
+    for k in range(len(sequence) - 1, -1, -1):
+        if COLOR not in sequence[k].reads:
+            return sequence[k:]
+    return sequence
+
 def register(func):
     """
     Layer register function.
@@ -61,3 +221,59 @@ def register(func):
 def get_layers():
     import layers # Force all registrations to occur.
     return LAYERS
+
+# Fused lookup layers, by the ids of the layers they replace.
+# The replaced layers are kept alongside, so that their ids stay unique.
+_lookup_layers: dict[tuple[int, ...], tuple[tuple[Layer, ...], Layer]] = {}
+MAX_LOOKUP_LAYERS = 4096
+
+def fuse_layers(sequence: tuple[Layer, ...]) -> tuple[Layer, ...]:
+    """
+    Replaces every run of two or more lookup layers (see Layer.lookup) with
+    a single layer applying one 3x256 table, giving the same colour as the run.
+    Colour channels must be integers in 0-255.
+    """
+    fused = ()
+    k = 0
+    while k < len(sequence):
+        end = k
+        while end < len(sequence) and sequence[end].lookup:
+            end += 1
+        if end - k >= 2:
+            fused += (lookup_layer(sequence[k:end]), )
+            k = end
+        else:
+            fused += (sequence[k], )
+            k += 1
+    return fused
+
+def lookup_layer(run: tuple[Layer, ...]) -> Layer:
+    """
+    The layer applying a run of lookup layers as one table per channel.
+    Tables are built once per distinct run and reused.
+    """
+    key = tuple(id(layer) for layer in run)
+    if key in _lookup_layers:
+        return _lookup_layers[key][1]
+
+    values = np.arange(256, dtype=np.int64)
+    table = np.stack([values, values, values], axis=1)
+    zeros = np.zeros(256, dtype=np.int64)
+    for layer in run:
+        table = layer.apply_batch(table, 0, zeros, zeros)
+    table = np.ascontiguousarray(table.T)
+    rows = table.tolist()
+    channels = np.arange(3)
+
+    def apply(color, timestamp, x, y):
+        return (rows[0][color[0]], rows[1][color[1]], rows[2][color[2]])
+
+    def kernel(colors, timestamp, xs, ys):
+        return table[channels, colors]
+
+    apply.__name__ = "+".join(layer.name for layer in run)
+    layer = Layer(-1, apply, batch=kernel, reads=frozenset((COLOR, )), channelwise=True)
+    if len(_lookup_layers) >= MAX_LOOKUP_LAYERS:
+        _lookup_layers.clear()
+    _lookup_layers[key] = (run, layer)
+    return layer
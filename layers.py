@@ -1,12 +1,59 @@
 """
 All layers are defined here.
+
+Each layer also has a batch kernel, applying it to many squares at once.
+See Layer.apply_batch for the arguments a kernel is given.
 """
 
 import colorsys
-from layer_util import background, register
+import numpy as np
+from layer_util import background, batch, channelwise, reads, register, timing
+
+def _constant_batch(color):
+    def kernel(colors, timestamp, xs, ys):
+        result = np.empty((len(colors), 3), dtype=np.int64)
+        result[:] = color
+        return result
+    return kernel
+
+def _hls_channel(m1, m2, hues):
+    # colorsys._v over an array of hues, with the same operations in the same order.
+    hues = hues % 1.0
+    return np.select(
+        [hues < colorsys.ONE_SIXTH, hues < 0.5, hues < colorsys.TWO_THIRD],
+        [m1 + (m2-m1)*hues*6.0, m2, m1 + (m2-m1)*(colorsys.TWO_THIRD-hues)*6.0],
+        m1,
+    )
+
+def hls_to_rgb_batch(hues, lightness, saturation):
+    """
+    colorsys.hls_to_rgb for an array of hues sharing one lightness and saturation.
+    Returns an (n, 3) float array, equal to colorsys's output for every hue.
+    """
+    if saturation == 0.0:
+        return np.full((len(hues), 3), lightness)
+    if lightness <= 0.5:
+        m2 = lightness * (1.0+saturation)
+    else:
+        m2 = lightness+saturation-(lightness*saturation)
+    m1 = 2.0*lightness - m2
+    return np.stack([
+        _hls_channel(m1, m2, hues+colorsys.ONE_THIRD),
+        _hls_channel(m1, m2, hues),
+        _hls_channel(m1, m2, hues-colorsys.ONE_THIRD),
+    ], axis=1)
+
+def _rainbow_batch(colors, timestamp, xs, ys):
+    rgb = hls_to_rgb_batch((timestamp/20 + xs/20 + ys/20)%1, 0.6, 0.6)
+    # int() truncates, and every channel is positive, so this is the same.
+    return (255*rgb).astype(np.int64)
 
 @register
 @background(200, 0, 120)
+@batch(_rainbow_batch)
+@reads("timestamp", "x", "y")
+# No @timing: the colour moves every 1/37 of a second or so, at different times for each square,
+# and working out when costs as much as computing it.
 def rainbow(color, timestamp, x, y):
     return tuple(
         int(255*x)
@@ -15,19 +62,33 @@ def rainbow(color, timestamp, x, y):
 
 @register
 @background(170, 170, 170)
+@batch(_constant_batch((0, 0, 0)))
+@reads()
 def black(color, timestamp, x, y):
     return (0, 0, 0)
 
+def _lighten_batch(colors, timestamp, xs, ys):
+    return np.minimum(255, np.asarray(colors, dtype=np.int64) + 40)
+
 @register
 @background(240, 240, 240)
+@batch(_lighten_batch)
+@reads("color")
+@channelwise()
 def lighten(color, timestamp, x, y):
     return tuple(
         min(255, x + 40)
         for x in color
     )
 
+def _invert_batch(colors, timestamp, xs, ys):
+    return 255 - np.asarray(colors, dtype=np.int64)
+
 @register
 @background(0, 255, 255)
+@batch(_invert_batch)
+@reads("color")
+@channelwise()
 def invert(color, timestamp, x, y):
     return tuple(
         255 - c
@@ -36,37 +97,91 @@ def invert(color, timestamp, x, y):
 
 @register
 @background(255, 0, 0)
+@batch(_constant_batch((255, 0, 0)))
+@reads()
 def red(color, timestamp, x, y):
     return (255, 0, 0)
 
 @register
 @background(0, 255, 0)
+@batch(_constant_batch((0, 255, 0)))
+@reads()
 def green(color, timestamp, x, y):
     return (0, 255, 0)
 
 @register
 @background(0, 0, 255)
+@batch(_constant_batch((0, 0, 255)))
+@reads()
 def blue(color, timestamp, x, y):
     return (0, 0, 255)
 
+def lcg_jump(steps, multiplier=1103515245, increment=12345, modulus=1 << 31):
+    """
+    Returns (a, c) such that stepping the generator
+    x -> (multiplier * x + increment) % modulus `steps` times
+    is the same as x -> (a * x + c) % modulus.
+    Squares the step map, so it takes O(log steps) multiplications.
+    """
+    a, c = 1, 0
+    step_a, step_c = multiplier, increment
+    while steps:
+        if steps & 1:
+            a, c = (step_a * a) % modulus, (step_a * c + step_c) % modulus
+        step_a, step_c = (step_a * step_a) % modulus, (step_a * step_c + step_c) % modulus
+        steps >>= 1
+    return a, c
+
+# sparkle steps its generator 10 + (ts * 31 % 17) times, so between 10 and 26.
+_SPARKLE_JUMPS = [lcg_jump(steps) for steps in range(27)]
+_SPARKLE_A = np.array([a for a, c in _SPARKLE_JUMPS], dtype=np.int64)
+_SPARKLE_C = np.array([c for a, c in _SPARKLE_JUMPS], dtype=np.int64)
+
+def _sparkle_batch(colors, timestamp, xs, ys):
+    ts = ((timestamp + xs/3 + ys/5) * 3).astype(np.int64)
+    steps = 10 + (ts * 31 % 17)
+    a = _SPARKLE_A[steps]
+    c = _SPARKLE_C[steps]
+    # Both fit in int64: a < 2^31 and other < 2^31 + y.
+    other = (a * np.asarray(xs, dtype=np.int64) + c) % (1 << 31)
+    other = (a * (other + ys) + c) % (1 << 31)
+    other = (other & ((1 << 31)-1)) >> 16
+    bright = other/(1 << 15) < 0.1
+    return np.where(
+        bright[:, np.newaxis],
+        lighten.apply_batch(colors, timestamp, xs, ys),
+        darken.apply_batch(colors, timestamp, xs, ys),
+    )
+
+def _sparkle_phase(timestamp, x, y):
+    # sparkle only uses the timestamp through int((timestamp + x/3 + y/5) * 3).
+    return np.floor((timestamp + x/3 + y/5) * 3)
+
 @register
 @background(100, 170, 255)
+@batch(_sparkle_batch)
+@reads("color", "timestamp", "x", "y")
+@timing(phase=_sparkle_phase)
 def sparkle(color, timestamp, x, y):
     ts = int((timestamp + x/3 + y/5) * 3)
-    other = x
-    for _ in range(10 + (ts * 31 % 17)):
-        other = (1103515245 * other + 12345) % (1 << 31)
+    # Jumps straight past all 10 + (ts * 31 % 17) generator steps.
+    a, c = _SPARKLE_JUMPS[10 + (ts * 31 % 17)]
+    other = (a * x + c) % (1 << 31)
     other += y
-    for _ in range(10 + (ts * 31 % 17)):
-        other = (1103515245 * other + 12345) % (1 << 31)
-    ts = int((timestamp + x/10 + y/20) * 3)
+    other = (a * other + c) % (1 << 31)
     other = (other & ((1 << 31)-1)) >> 16
     if other/(1 << 15) < 0.1:
         return lighten.apply(color, timestamp, x, y)
     return darken.apply(color, timestamp, x, y)
 
+def _darken_batch(colors, timestamp, xs, ys):
+    return np.maximum(0, np.asarray(colors, dtype=np.int64) - 40)
+
 @register
 @background(30, 30, 30)
+@batch(_darken_batch)
+@reads("color")
+@channelwise()
 def darken(color, timestamp, x, y):
     return tuple(
         max(0, x - 40)
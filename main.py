@@ -1,7 +1,8 @@
 import arcade
 import arcade.key as keys
 import math
-from grid import Grid
+import time
+from grid import Grid, SparseGrid, SetGrid
 from layer_util import get_layers, Layer
 from layers import lighten
 
@@ -15,12 +16,32 @@ class MyWindow(arcade.Window):
     SCREEN_TITLE = "Paint"
 
     REPLAY_TIMER_DELTA = 0.05
+    # Replay steps due per REPLAY_TIMER_DELTA. All the steps due in a frame are
+    # played together, and the grid is rendered once after them.
+    REPLAY_SPEED = 1
+    # Most seconds of a frame spent playing replay steps. No step is ever skipped:
+    # once the budget runs out the rest wait for later frames, so playback slows down.
+    REPLAY_FRAME_BUDGET = 1 / 120
+    # Play the replay as fast as the frame budget allows, and only
+    # render the grid again once it has finished.
+    REPLAY_MAX_SPEED = False
 
     GRID_SIZE_X = 32
     GRID_SIZE_Y = 32
 
     BG = [255, 255, 255]
 
+    # Draw the grid as one texture in a single draw call,
+    # rather than one rectangle per grid square.
+    GRID_AS_TEXTURE = True
+
+    # SparseGrid only creates stores for painted squares,
+    # which makes large, mostly empty canvases cheap. Grid creates them all up front.
+    GRID_TYPE = SparseGrid
+    # Draw styles with a Grid of their own, used instead of GRID_TYPE.
+    # SetGrid keeps the whole canvas in arrays, a few bytes per square.
+    STYLE_GRID_TYPES = {Grid.DRAW_STYLE_SET: SetGrid}
+
     # SCAFFOLD PART
     # Unless you're adding new features, you shouldn't need to touch this.
 
@@ -36,11 +57,17 @@ class MyWindow(arcade.Window):
         self.y_timer = 0
         self.enable_ui = True
         self.replay_timer = 0
+        self.replay_speed = self.REPLAY_SPEED
+        self.replay_max_speed = self.REPLAY_MAX_SPEED
+        self.grid_frame = None
+        self.grid_program = None
+        self.grid_texture = None
+        self.grid_geometry = None
         self.on_init()
 
     def reset(self) -> None:
         """Reset the screen."""
-        self.grid = Grid(self.draw_style, self.GRID_SIZE_X, self.GRID_SIZE_Y)
+        self.grid = self.new_grid()
         self.timestamp = 0
 
         self.selected_layer_index = -1
@@ -121,6 +148,20 @@ class MyWindow(arcade.Window):
         # UI - Draw Modes / Action buttons
         self.action_buttons.draw()
         # Grid
+        if self.replay_max_speed and not self.enable_ui and self.grid_frame is not None:
+            # Mid-replay at max speed, so show the last frame rather than rendering.
+            frame = self.grid_frame
+        else:
+            frame = self.grid.render(self.BG[:], self.timestamp)
+            self.grid_frame = frame
+        if self.GRID_AS_TEXTURE:
+            self.draw_grid_texture(frame)
+        else:
+            self.draw_grid_squares(frame)
+
+    def draw_grid_squares(self, frame) -> None:
+        """Draw each grid square as its own rectangle."""
+        frame = frame.tolist()
         for x in range(self.GRID_SIZE_X):
             for y in range(self.GRID_SIZE_Y):
                 arcade.draw_lrtb_rectangle_filled(
@@ -128,9 +169,33 @@ class MyWindow(arcade.Window):
                     self.GRID_SQ_WIDTH * (x+1),
                     self.GRID_SQ_HEIGHT * (y+1),
                     self.GRID_SQ_HEIGHT * y,
-                    self.grid[x][y].get_color(self.BG[:], self.timestamp, x, y),
+                    frame[x][y],
                 )
 
+    def draw_grid_texture(self, frame) -> None:
+        """
+        Draw the grid as a single texture with one texel per grid square.
+        The texture and quad are only rebuilt when the grid dimensions change,
+        otherwise the frame is just uploaded into the existing texture.
+        """
+        size = (frame.shape[0], frame.shape[1])
+        if self.grid_program is None:
+            self.grid_program = self.ctx.load_program(
+                vertex_shader=":resources:shaders/texture_default_projection_vs.glsl",
+                fragment_shader=":resources:shaders/texture_fs.glsl",
+            )
+        if self.grid_texture is None or self.grid_texture.size != size:
+            self.grid_texture = self.ctx.texture(
+                size, components=3, filter=(self.ctx.NEAREST, self.ctx.NEAREST),
+            )
+            # The quad covers the drawing panel, in normalised device coordinates.
+            panel = self.DRAW_PANEL / self.SCREEN_WIDTH
+            self.grid_geometry = arcade.gl.geometry.quad_2d(size=(2 * panel, 2.0), pos=(panel - 1, 0.0))
+        # Texture rows run bottom to top, so y indexes rows and x indexes columns.
+        self.grid_texture.write(frame.transpose(1, 0, 2).tobytes())
+        self.grid_texture.use(0)
+        self.grid_geometry.render(self.grid_program)
+
     def on_mouse_press(self, x: int, y: int, button: int, modifiers: int) -> None:
         """Called when the mouse buttons are pressed."""
         if x > self.DRAW_PANEL:
@@ -200,6 +265,13 @@ class MyWindow(arcade.Window):
     def on_key_press(self, symbol: int, modifiers: int) -> None:
         """Called when a keyboard key is pressed."""
         if not self.enable_ui:
+            # Replay speed: M toggles max speed, up and down double and halve it.
+            if symbol == keys.M:
+                self.replay_max_speed = not self.replay_max_speed
+            elif symbol == keys.UP:
+                self.replay_speed *= 2
+            elif symbol == keys.DOWN:
+                self.replay_speed /= 2
             return
         self.z_pressed = keys.Z == symbol and (modifiers & keys.MOD_CTRL)
         self.y_pressed = keys.Y == symbol and (modifiers & keys.MOD_CTRL)
@@ -245,10 +317,16 @@ class MyWindow(arcade.Window):
                     self.prev_drawn = (px, py)
         self.prev_pos = (x, y)
 
+    def new_grid(self) -> Grid:
+        """Create an empty grid for the current draw style."""
+        grid_type = self.STYLE_GRID_TYPES.get(self.draw_style, self.GRID_TYPE)
+        return grid_type(self.draw_style, self.GRID_SIZE_X, self.GRID_SIZE_Y)
+
     def start_replay(self) -> None:
         """Begin the replay mode."""
         self.enable_ui = False
-        self.grid = Grid(self.draw_style, self.GRID_SIZE_X, self.GRID_SIZE_Y)
+        self.grid = self.new_grid()
+        self.grid_frame = None
         self.replay_timer = self.REPLAY_TIMER_DELTA
         self.on_replay_start()
 
@@ -266,12 +344,18 @@ class MyWindow(arcade.Window):
                 self.on_redo()
                 self.y_timer += 0.05
         if not self.enable_ui:
-            self.replay_timer -= delta_time
-            if self.replay_timer <= 0:
-                self.replay_timer += self.REPLAY_TIMER_DELTA
-                finished = self.on_replay_next_step()
-                if finished:
-                    self.enable_ui = True
+            deadline = time.perf_counter() + self.REPLAY_FRAME_BUDGET
+            if self.replay_max_speed:
+                finished = self.on_replay_next_steps(None, deadline)
+            else:
+                self.replay_timer -= delta_time * self.replay_speed
+                due = 0
+                if self.replay_timer <= 0:
+                    due = int(-self.replay_timer // self.REPLAY_TIMER_DELTA) + 1
+                    self.replay_timer += due * self.REPLAY_TIMER_DELTA
+                finished = due > 0 and self.on_replay_next_steps(due, deadline)
+            if finished:
+                self.enable_ui = True
 
     def change_draw_mode(self) -> None:
         """Changes the draw mode of the application, and resets the window."""
@@ -338,6 +422,20 @@ class MyWindow(arcade.Window):
         """
         return True
 
+    def on_replay_next_steps(self, n: int | None, deadline: float) -> bool:
+        """
+        Called once a frame when n more steps of the replay are due, or every remaining step if n is None.
+        Should stop once time.perf_counter() reaches deadline, after at least one step.
+        Returns whether the replay is finished.
+        ReplayTracker.play_until does all of this in one call.
+        """
+        played = 0
+        while not self.on_replay_next_step():
+            played += 1
+            if played == n or time.perf_counter() >= deadline:
+                return False
+        return True
+
     def on_increase_brush_size(self):
         """Called when an increase to the brush size is requested."""
         self.grid.increase_brush_size()
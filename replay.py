@@ -1,15 +1,46 @@
 from __future__ import annotations
-from action import PaintAction
+import sys
+import time
+import numpy as np
+from action import ActionLog, PaintAction, PackedActions
 from grid import Grid
 
 class ReplayTracker:
+    """
+    Records actions, packed by PackedActions, and plays them back on a grid.
+    Given an ActionLog, actions are written to its file instead, and read back as they are played.
 
+    While playing, a snapshot of the grid (a keyframe) is kept every KEYFRAME_ACTIONS
+    actions or KEYFRAME_STEPS steps. seek can then jump to any action, backwards too,
+    by restoring the nearest keyframe before it and playing only the actions after that.
+    Once the keyframes use more than max_keyframe_bytes, every other one is dropped
+    and the spacing doubles, so they always cover the whole recording evenly.
+    """
+
+    KEYFRAME_ACTIONS = 100
+    KEYFRAME_STEPS = 10000
+    DEFAULT_MAX_KEYFRAME_BYTES = 64 << 20
+
+    def __init__(
+        self,
+        max_keyframe_bytes: int = DEFAULT_MAX_KEYFRAME_BYTES,
+        log: ActionLog | None = None,
+        keyframe_actions: int = KEYFRAME_ACTIONS,
+    ) -> None:
+        self.actions = PackedActions(None) if log is None else log
+        self.position = 0 # number of the next action to play
+        self.max_keyframe_bytes = max_keyframe_bytes
+        self.keyframe_actions = keyframe_actions
+        self.keyframe_steps = self.KEYFRAME_STEPS
+        # (actions played, grid snapshot, size in bytes) triples, by position.
+        self.keyframes: list[tuple[int, object, int]] = []
 
     def start_replay(self) -> None:
         """
         Called whenever we should stop taking actions, and start playing them back.
 
-        Useful if you have any setup to do before `play_next_action` should be called.
+        Playing continues from the first action not yet played.
+        Use seek to play from anywhere else.
         """
         pass
 
@@ -20,7 +51,7 @@ class ReplayTracker:
         `is_undo` specifies whether the action was an undo action or not.
         Special, Redo, and Draw all have this is False.
         """
-        pass
+        self.actions.append(action, is_undo)
 
     def play_next_action(self, grid: Grid) -> bool:
         """
@@ -29,7 +60,125 @@ class ReplayTracker:
             - If there were no more actions to play, and so nothing happened, return True.
             - Otherwise, return False.
         """
-        pass
+        if self.position >= self.actions.end:
+            return True
+        if not self.keyframes:
+            # The state before the first action played, so seek can go back to it.
+            self._add_keyframe(grid)
+        self._play(grid, self.position)
+        self.position += 1
+        if self._keyframe_due():
+            self._add_keyframe(grid)
+        return False
+
+    def play_next_actions(self, grid: Grid, n: int) -> bool:
+        """
+        Plays up to the next n replay actions on the grid.
+        Returns whether every action has now been played.
+        """
+        stop = min(self.position + n, self.actions.end)
+        while self.position < stop:
+            self.play_next_action(grid)
+        return self.position >= self.actions.end
+
+    def play_until(self, grid: Grid, deadline: float, n: int | None = None, clock=time.perf_counter) -> bool:
+        """
+        Plays replay actions on the grid until clock() reaches deadline,
+        or n actions have been played if n is given.
+        At least one action is played, so a replay always moves on.
+        Returns whether every action has now been played.
+        """
+        stop = self.actions.end if n is None else min(self.position + n, self.actions.end)
+        if self.position < stop:
+            self.play_next_action(grid)
+        while self.position < stop and clock() < deadline:
+            self.play_next_action(grid)
+        return self.position >= self.actions.end
+
+    def seek(self, grid: Grid, position: int) -> None:
+        """
+        Brings the grid to how it was after the first `position` actions were played.
+        grid should be the grid this tracker has been playing on.
+        Positions before the first keyframe, or past the last action, are clamped.
+
+        :complexity: O(restoring a keyframe + the actions after it), using the nearest
+                     keyframe at or before position. Seeking forward past no keyframe
+                     just plays on from the current position.
+        """
+        if self.keyframes:
+            position = max(position, self.keyframes[0][0])
+        position = min(position, self.actions.end)
+        keyframe = None
+        for number, snapshot, _ in reversed(self.keyframes):
+            if number <= position:
+                keyframe = (number, snapshot)
+                break
+        if keyframe is not None and (position < self.position or keyframe[0] > self.position):
+            # Going back, or jumping over actions a keyframe already covers.
+            self._restore(grid, *keyframe)
+        while self.position < position:
+            self.play_next_action(grid)
+
+    def _restore(self, grid: Grid, number: int, snapshot) -> None:
+        """ Restores the keyframe taken after `number` actions, over the grid at self.position. """
+        start, stop = min(number, self.position), max(number, self.position)
+        if self.actions.count_specials(start, stop):
+            # special changed every square
+            grid.restore(snapshot)
+        else:
+            _, xs, ys = self.actions.step_arrays(start, stop)
+            changed = np.unique(np.stack([xs, ys], axis=1), axis=0)
+            grid.restore(snapshot, [tuple(position) for position in changed.tolist()])
+        self.position = number
+
+    def _play(self, grid: Grid, k: int) -> None:
+        action = self.actions[k]
+        if self.actions.is_undo(k):
+            action.undo_apply(grid)
+        else:
+            action.redo_apply(grid)
+
+    def _keyframe_due(self) -> bool:
+        """ Whether the last keyframe is far enough behind the current position. """
+        last = self.keyframes[-1][0]
+        if self.position <= last:
+            return False
+        return (
+            self.position - last >= self.keyframe_actions
+            or self.actions.step_start(self.position) - self.actions.step_start(last) >= self.keyframe_steps
+        )
+
+    def _add_keyframe(self, grid: Grid) -> None:
+        """ Keeps a snapshot of the grid at the current position, thinning keyframes if over budget. """
+        for number, _, _ in self.keyframes:
+            if number == self.position:
+                return
+        snapshot = grid.snapshot()
+        keyframe = (self.position, snapshot, snapshot_bytes(snapshot))
+        self.keyframes.append(keyframe)
+        self.keyframes.sort(key=lambda keyframe: keyframe[0])
+        while sum(size for _, _, size in self.keyframes) > self.max_keyframe_bytes and len(self.keyframes) > 1:
+            # keep the first keyframe, and every other one after it
+            self.keyframes = self.keyframes[::2]
+            self.keyframe_actions *= 2
+            self.keyframe_steps *= 2
+
+def snapshot_bytes(snapshot) -> int:
+    """
+    Rough size of a grid snapshot: its containers, arrays and numbers.
+    Layers and other shared objects inside it are not counted.
+    """
+    if isinstance(snapshot, np.ndarray):
+        return snapshot.nbytes
+    if isinstance(snapshot, dict):
+        return sys.getsizeof(snapshot) + sum(
+            snapshot_bytes(key) + snapshot_bytes(value) for key, value in snapshot.items()
+        )
+    if isinstance(snapshot, (tuple, list)):
+        return sys.getsizeof(snapshot) + sum(snapshot_bytes(item) for item in snapshot)
+    if isinstance(snapshot, (int, float, bool)):
+        return sys.getsizeof(snapshot)
+    return 0
 
 if __name__ == "__main__":
     action1 = PaintAction([], is_special=True)
@@ -49,4 +198,3 @@ if __name__ == "__main__":
     f3 = r.play_next_action(g) # action 2, undo
     t = r.play_next_action(g)  # True, nothing to do.
     assert (f1, f2, f3, t) == (False, False, False, True)
-
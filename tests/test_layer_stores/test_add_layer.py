@@ -2,7 +2,7 @@ import unittest
 from ed_utils.decorators import number
 
 from layer_store import AdditiveLayerStore
-from layers import black, lighten, rainbow, invert
+from layers import black, lighten, rainbow, invert, darken, sparkle
 
 class TestAddLayer(unittest.TestCase):
 
@@ -62,3 +62,18 @@ class TestAddLayer(unittest.TestCase):
         s.erase(black)
         s.add(invert)
         self.assertEqual(s.get_color((100, 100, 100), 7, 0, 0), (255-91, 255-214, 255-104))
+
+    @number("2.6")
+    def test_many_layers(self):
+        s = AdditiveLayerStore()
+        s.add(sparkle)
+        for i in range(500):
+            s.add([lighten, invert, darken][i % 3])
+        current = (100, 100, 100)
+        current = sparkle.apply(current, 3, 5, 6)
+        for i in range(500):
+            current = [lighten, invert, darken][i % 3].apply(current, 3, 5, 6)
+        self.assertEqual(s.get_color((100, 100, 100), 3, 5, 6), current)
+        s.erase(sparkle)
+        s.add(black)
+        self.assertEqual(s.get_color((100, 100, 100), 3, 5, 6), (0, 0, 0))
@@ -0,0 +1,59 @@
+import unittest
+from ed_utils.decorators import number
+
+from layer_store import BitSequenceLayerStore, name_ranks
+from layer_util import Layer, get_layers
+from layers import black, lighten, rainbow, invert
+
+class TestBitSeqLayer(unittest.TestCase):
+
+    @number("3.6")
+    def test_layers(self):
+        s = BitSequenceLayerStore()
+        self.assertEqual(s.get_color((1, 2, 3), 0, 1, 1), (1, 2, 3))
+        self.assertTrue(s.add(black))
+        self.assertFalse(s.add(black))
+        s.add(lighten)
+        self.assertEqual(s.get_color((100, 100, 100), 0, 20, 40), (40, 40, 40))
+        self.assertTrue(s.erase(lighten))
+        self.assertFalse(s.erase(lighten))
+        s.add(rainbow)
+        # Rainbow comes before black.
+        self.assertEqual(s.layer_sequence(), (rainbow, black))
+        self.assertEqual(s.get_color((20, 20, 20), 7, 0, 0), (0, 0, 0))
+        with self.assertRaises(ValueError):
+            s.add(Layer(-1, lambda color, timestamp, x, y: color))
+
+    @number("3.7")
+    def test_special(self):
+        s = BitSequenceLayerStore()
+        s.add(invert)
+        s.add(lighten)
+        s.add(rainbow)
+        s.add(black)
+        self.assertEqual(s.get_color((100, 100, 100), 0, 0, 0), (215, 215, 215))
+        s.special() # Remove: Invert
+        self.assertEqual(s.get_color((100, 100, 100), 7, 0, 0), (40, 40, 40))
+        s.special() # Remove: Lighten
+        self.assertEqual(s.get_color((100, 100, 100), 7, 0, 0), (0, 0, 0))
+        s.special() # Remove: Black
+        self.assertEqual(s.get_color((100, 100, 100), 7, 0, 0), (91, 214, 104))
+        s.special()
+        s.special()
+        self.assertEqual(s.layer_sequence(), ())
+
+    @number("3.8")
+    def test_median_matches_sorting(self):
+        registry = [layer for layer in get_layers() if layer is not None]
+        ranks, indices = name_ranks()
+        self.assertEqual([registry[i].name for i in indices], sorted(layer.name for layer in registry))
+        for mask in range(1, 1 << len(registry), 37):
+            s = BitSequenceLayerStore()
+            applied = [layer for layer in registry if (mask >> layer.index) & 1]
+            for layer in applied:
+                s.add(layer)
+            names = sorted(layer.name for layer in applied)
+            s.special()
+            remaining = [layer.name for layer in s.layer_sequence()]
+            self.assertNotIn(names[(len(names) - 1) // 2], remaining)
+            self.assertEqual(len(remaining), len(applied) - 1)
@@ -0,0 +1,126 @@
+import unittest
+import numpy as np
+from ed_utils.decorators import number
+
+from layer_util import Layer, get_layers, fold_layers, fuse_layers
+import colorsys
+from layers import black, lighten, rainbow, invert, sparkle, darken, lcg_jump, hls_to_rgb_batch
+
+class TestBatch(unittest.TestCase):
+
+    def squares(self):
+        xs, ys = np.meshgrid(np.arange(40), np.arange(35), indexing="ij")
+        xs = xs.reshape(-1)
+        ys = ys.reshape(-1)
+        colors = np.stack([(xs * 7) % 256, (ys * 13) % 256, (xs * ys) % 256], axis=1)
+        return colors, xs, ys
+
+    @number("8.1")
+    def test_builtin_kernels(self):
+        colors, xs, ys = self.squares()
+        for layer in get_layers():
+            if layer is None:
+                break
+            self.assertIsNotNone(layer.batch, f"{layer.name} has no batch kernel")
+            for timestamp in [0, 7, 0.35, 123.456]:
+                result = layer.apply_batch(colors, timestamp, xs, ys)
+                expected = [
+                    layer.apply(tuple(color), timestamp, x, y)
+                    for color, x, y in zip(colors.tolist(), xs.tolist(), ys.tolist())
+                ]
+                self.assertEqual(
+                    [tuple(c) for c in result.tolist()], expected,
+                    f"{layer.name} batch differs at {timestamp}"
+                )
+
+    @number("8.2")
+    def test_scalar_fallback(self):
+        def swap(color, timestamp, x, y):
+            return (color[2], color[1] + x % 2, color[0])
+        layer = Layer(-1, swap)
+        colors, xs, ys = self.squares()
+        result = layer.apply_batch(colors, 3, xs, ys)
+        self.assertEqual(result[5].tolist(), list(swap(tuple(colors[5].tolist()), 3, xs[5], ys[5])))
+        self.assertEqual(layer.apply_batch(colors[:0], 3, xs[:0], ys[:0]).shape, (0, 3))
+
+    @number("8.3")
+    def test_reads_declarations(self):
+        # Changing an input a layer does not declare must not change its output.
+        cases = [
+            ((10, 200, 30), 7, 3, 4),
+            ((99, 0, 255), 7, 3, 4),
+            ((10, 200, 30), 31.5, 3, 4),
+            ((10, 200, 30), 7, 12, 4),
+            ((10, 200, 30), 7, 3, 25),
+        ]
+        names = ["color", "timestamp", "x", "y"]
+        for layer in get_layers():
+            if layer is None:
+                break
+            base = layer.apply(*cases[0])
+            for k, case in enumerate(cases[1:]):
+                if names[k] not in layer.reads:
+                    self.assertEqual(layer.apply(*case), base, f"{layer.name} reads {names[k]}")
+
+    @number("8.4")
+    def test_fold_layers(self):
+        self.assertEqual(fold_layers((lighten, black, invert)), (black, invert))
+        self.assertEqual(fold_layers((sparkle, rainbow, lighten, black)), (black,))
+        self.assertEqual(fold_layers((invert, lighten)), (invert, lighten))
+        self.assertEqual(fold_layers(()), ())
+
+    @number("8.5")
+    def test_fuse_layers(self):
+        run = (lighten, invert, darken, darken, lighten, invert)
+        fused = fuse_layers((rainbow, ) + run + (sparkle, lighten))
+        self.assertEqual(len(fused), 4)
+        self.assertIs(fused[0], rainbow)
+        self.assertIs(fuse_layers(run)[0], fused[1], "Tables should be reused for the same run")
+        colors, xs, ys = self.squares()
+        expected = colors
+        for layer in run:
+            expected = layer.apply_batch(expected, 0, xs, ys)
+        self.assertEqual(fused[1].apply_batch(colors, 0, xs, ys).tolist(), expected.tolist())
+        for color in [(0, 0, 0), (255, 128, 3), (39, 40, 41)]:
+            current = color
+            for layer in run:
+                current = layer.apply(current, 0, 0, 0)
+            self.assertEqual(fused[1].apply(color, 0, 0, 0), current)
+
+    @number("8.6")
+    def test_sparkle_jump(self):
+        def stepped(other, steps):
+            for _ in range(steps):
+                other = (1103515245 * other + 12345) % (1 << 31)
+            return other
+        for steps in [1, 10, 17, 26, 1000]:
+            a, c = lcg_jump(steps)
+            for other in [0, 1, 31, 12345, (1 << 31) - 1, (1 << 31) + 40]:
+                self.assertEqual((a * other + c) % (1 << 31), stepped(other, steps))
+
+        def original(color, timestamp, x, y):
+            ts = int((timestamp + x/3 + y/5) * 3)
+            other = stepped(x, 10 + (ts * 31 % 17)) + y
+            other = stepped(other, 10 + (ts * 31 % 17))
+            other = (other & ((1 << 31)-1)) >> 16
+            if other/(1 << 15) < 0.1:
+                return lighten.apply(color, timestamp, x, y)
+            return darken.apply(color, timestamp, x, y)
+        for timestamp in [0, 0.1, 5.55, 40]:
+            for x in range(0, 60, 7):
+                for y in range(0, 60, 3):
+                    self.assertEqual(
+                        sparkle.apply((90, 20, 250), timestamp, x, y),
+                        original((90, 20, 250), timestamp, x, y),
+                    )
+
+    @number("8.7")
+    def test_hls_to_rgb(self):
+        hues = np.concatenate([
+            np.linspace(0, 1, 10007),
+            [0, 1/6, 0.5, 2/3, 1/3, 1 - 1e-12, 0.9999999999999999],
+        ])
+        for lightness, saturation in [(0.6, 0.6), (0.3, 0.9), (0.5, 0)]:
+            expected = [colorsys.hls_to_rgb(h, lightness, saturation) for h in hues.tolist()]
+            result = hls_to_rgb_batch(hues, lightness, saturation)
+            self.assertEqual([tuple(c) for c in result.tolist()], expected)
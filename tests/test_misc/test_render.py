@@ -0,0 +1,132 @@
+import random
+import sys
+import threading
+import unittest
+import numpy as np
+from ed_utils.decorators import number
+
+from grid import Grid, SetGrid, SparseGrid
+from layer_util import Layer, batch, reads, timing
+from layers import rainbow, black, lighten, invert, sparkle, darken, red
+
+class TestRender(unittest.TestCase):
+
+    def paint(self, grid: Grid):
+        grid[0][0].add(black)
+        grid[1][2].add(rainbow)
+        grid[1][2].add(lighten)
+        grid[3][1].add(sparkle)
+        grid[3][1].add(invert)
+        grid[4][4].add(darken)
+        grid[2][3].add(red)
+        grid[2][3].add(sparkle)
+
+    @number("7.1")
+    def test_matches_get_color(self):
+        for style in Grid.DRAW_STYLE_OPTIONS:
+            grid = Grid(style, 5, 6)
+            self.paint(grid)
+            for timestamp in [0, 7, 12.5]:
+                self.assertFrameMatches(grid, (255, 255, 255), timestamp)
+            grid.special()
+            self.assertFrameMatches(grid, (10, 20, 30), 3.25)
+
+    @number("7.2")
+    def test_empty(self):
+        grid = Grid(Grid.DRAW_STYLE_SET, 3, 2)
+        frame = grid.render([40, 50, 60], 0)
+        self.assertEqual(frame.shape, (3, 2, 3))
+        self.assertEqual(frame.tolist(), [[[40, 50, 60]] * 2] * 3)
+
+    @number("7.3")
+    def test_changes_between_renders(self):
+        for style in Grid.DRAW_STYLE_OPTIONS:
+            grid = Grid(style, 6, 5)
+            self.paint(grid)
+            self.assertFrameMatches(grid, (255, 255, 255), 1)
+            grid[1][2].erase(lighten)
+            grid[5][0].add(lighten)
+            grid[4][4].add(rainbow)
+            self.assertFrameMatches(grid, (255, 255, 255), 1)
+            # Animated squares change with no edits, static ones come from the cache.
+            self.assertFrameMatches(grid, (255, 255, 255), 2.7)
+            self.assertFrameMatches(grid, (0, 100, 0), 2.7)
+
+    @number("7.4")
+    def test_animation_phases(self):
+        for style in Grid.DRAW_STYLE_OPTIONS:
+            grid = Grid(style, 12, 9)
+            for x in range(12):
+                for y in range(9):
+                    grid[x][y].add([sparkle, lighten, rainbow][(x + y) % 3])
+                    if x % 4 == 0:
+                        grid[x][y].add(sparkle)
+            timestamp = 0
+            for frame in range(40):
+                self.assertFrameMatches(grid, (255, 255, 255), timestamp)
+                timestamp += 1/60
+            grid[3][3].add(invert)
+            self.assertFrameMatches(grid, (255, 255, 255), timestamp)
+
+    @number("7.5")
+    def test_paint_while_rendering(self):
+        # main.run_with_func paints from another thread while the window renders.
+        grids = [Grid(style, 64, 64) for style in Grid.DRAW_STYLE_OPTIONS]
+        grids += [SetGrid(Grid.DRAW_STYLE_SET, 64, 64), SparseGrid(Grid.DRAW_STYLE_ADD, 64, 64)]
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            for grid in grids:
+                errors = []
+                def paint():
+                    rng = random.Random(0)
+                    try:
+                        for _ in range(3000):
+                            grid[rng.randrange(64)][rng.randrange(64)].add(rng.choice([red, black, lighten, invert]))
+                    except Exception as e:
+                        errors.append(e)
+                thread = threading.Thread(target=paint)
+                thread.start()
+                while thread.is_alive():
+                    grid.render((255, 255, 255), 0)
+                thread.join()
+                self.assertEqual(errors, [])
+                self.assertFrameMatches(grid, (255, 255, 255), 0)
+        finally:
+            sys.setswitchinterval(interval)
+
+    @number("7.6")
+    def test_stepped_layer(self):
+        # A layer that only changes every quarter second is recomputed 4 times a second,
+        # instead of every frame, once it declares so. It reads no x or y,
+        # so each recompute is one colour for the whole group.
+        for declared, expected in [(True, 4), (False, 60)]:
+            computed = []
+            def blink_batch(colors, timestamp, xs, ys):
+                computed.append(len(colors))
+                result = np.empty((len(colors), 3), dtype=np.int64)
+                result[:] = blink(None, timestamp, 0, 0)
+                return result
+            def blink(color, timestamp, x, y):
+                return (0, 0, 0) if int(timestamp * 4) % 2 else (255, 255, 0)
+            blink = reads("timestamp")(batch(blink_batch)(blink))
+            if declared:
+                blink = timing(phase=lambda timestamp, x, y: timestamp // 0.25)(blink)
+            layer = Layer(-1, blink)
+            grid = Grid(Grid.DRAW_STYLE_ADD, 6, 6)
+            for x in range(6):
+                for y in range(6):
+                    grid[x][y].add(layer)
+            for frame in range(60):
+                self.assertFrameMatches(grid, (255, 255, 255), frame / 60)
+            self.assertEqual(sum(computed), expected)
+
+    def assertFrameMatches(self, grid: Grid, start, timestamp):
+        frame = grid.render(start, timestamp)
+        for x in range(grid.x):
+            for y in range(grid.y):
+                self.assertEqual(
+                    tuple(frame[x, y]),
+                    tuple(grid[x][y].get_color(start, timestamp, x, y)),
+                    f"Square ({x}, {y}) rendered differently at {timestamp}."
+                )
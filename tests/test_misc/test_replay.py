@@ -1,10 +1,12 @@
+import os
+import tempfile
 import unittest
 from ed_utils.decorators import number
 
-from action import PaintAction, PaintStep
+from action import ActionLog, PaintAction, PaintStep
 from replay import ReplayTracker
 from layers import blue, green, red, invert
-from grid import Grid
+from grid import Grid, SparseGrid, SetGrid
 
 class TestReplay(unittest.TestCase):
 
@@ -102,6 +104,124 @@ class TestReplay(unittest.TestCase):
         self.assertGridEqual(grid, control_grid)
         self.assertEqual(replay.play_next_action(grid), True) # Finished.
 
+    @number("5.4")
+    def test_seek(self):
+        grids = [(Grid, style) for style in Grid.DRAW_STYLE_OPTIONS]
+        grids += [(SparseGrid, Grid.DRAW_STYLE_SEQUENCE), (SetGrid, Grid.DRAW_STYLE_SET)]
+        for grid_type, style in grids:
+            replay = ReplayTracker(keyframe_actions=10)
+            actions = []
+            for i in range(120):
+                if i % 31 == 30:
+                    action = PaintAction([], is_special=True)
+                else:
+                    action = PaintAction([PaintStep(((i + j) % 9, (i * j) % 9), [red, green, blue][(i + j) % 3]) for j in range(i % 5 + 1)])
+                is_undo = i % 13 == 12
+                actions.append((actions[-1][0] if is_undo else action, is_undo))
+                replay.add_action(*actions[-1])
+            replay.start_replay()
+            grid = grid_type(style, 9, 9)
+            for _ in range(57):
+                replay.play_next_action(grid)
+            for position in [20, 3, 0, 100, 99, 120, 41, 57]:
+                replay.seek(grid, position)
+                self.assertEqual(replay.position, position)
+                control_grid = grid_type(style, 9, 9)
+                for action, is_undo in actions[:position]:
+                    if is_undo:
+                        action.undo_apply(control_grid)
+                    else:
+                        action.redo_apply(control_grid)
+                self.assertGridEqual(grid, control_grid)
+            self.assertEqual([number for number, _, _ in replay.keyframes], list(range(0, 121, 10)))
+
+            # Over budget, every other keyframe goes and the spacing doubles.
+            replay.max_keyframe_bytes = sum(size for _, _, size in replay.keyframes)
+            for _ in range(30):
+                replay.add_action(actions[0][0])
+            replay.seek(grid, 150)
+            self.assertEqual([number for number, _, _ in replay.keyframes], list(range(0, 141, 20)))
+            self.assertEqual(replay.keyframe_actions, 20)
+
+    @number("5.5")
+    def test_play_batches(self):
+        replay = ReplayTracker()
+        actions = [PaintAction([PaintStep((i % 4, i // 4 % 4), [red, green, blue][i % 3])]) for i in range(40)]
+        for action in actions:
+            replay.add_action(action)
+        replay.start_replay()
+        grid = Grid(Grid.DRAW_STYLE_ADD, 4, 4)
+        self.assertEqual(replay.play_next_actions(grid, 5), False)
+        self.assertEqual(replay.position, 5)
+
+        # A clock ticking once per call: plays one action per tick until the deadline.
+        ticks = iter(range(100))
+        clock = lambda: next(ticks)
+        self.assertEqual(replay.play_until(grid, 8, clock=clock), False)
+        self.assertEqual(replay.position, 14)
+        # Always at least one, even past the deadline.
+        self.assertEqual(replay.play_until(grid, 0), False)
+        self.assertEqual(replay.position, 15)
+        self.assertEqual(replay.play_until(grid, float('inf'), n=10), False)
+        self.assertEqual(replay.position, 25)
+
+        self.assertEqual(replay.play_until(grid, float('inf')), True)
+        self.assertEqual(replay.position, 40)
+        self.assertEqual(replay.play_next_actions(grid, 5), True)
+        control_grid = Grid(Grid.DRAW_STYLE_ADD, 4, 4)
+        for action in actions:
+            action.redo_apply(control_grid)
+        self.assertGridEqual(grid, control_grid)
+
+    @number("5.6")
+    def test_action_log(self):
+        actions = []
+        for i in range(80):
+            if i % 17 == 16:
+                action = PaintAction([], is_special=True)
+            else:
+                action = PaintAction([PaintStep((i % 7, (i * 3) % 7), [red, green, blue, invert][i % 4]) for _ in range(i % 3)])
+            is_undo = i % 11 == 10
+            actions.append((actions[-1][0] if is_undo else action, is_undo))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "session.log")
+            with ActionLog(path) as log:
+                for action, is_undo in actions[:50]:
+                    log.append(action, is_undo)
+                self.assertEqual(log[3], actions[3][0])
+            # Reopening picks up where the log left off.
+            with ActionLog(path) as log:
+                self.assertEqual(len(log), 50)
+                for action, is_undo in actions[50:]:
+                    log.append(action, is_undo)
+                for k, (action, is_undo) in enumerate(actions):
+                    self.assertEqual(log[k], action)
+                    self.assertEqual(log.is_undo(k), is_undo)
+                size = os.path.getsize(path)
+
+                replay = ReplayTracker(log=log, keyframe_actions=10)
+                grid = Grid(Grid.DRAW_STYLE_ADD, 7, 7)
+                for position in [80, 35, 0, 64]:
+                    replay.seek(grid, position)
+                    control_grid = Grid(Grid.DRAW_STYLE_ADD, 7, 7)
+                    for action, is_undo in actions[:position]:
+                        if is_undo:
+                            action.undo_apply(control_grid)
+                        else:
+                            action.redo_apply(control_grid)
+                    self.assertGridEqual(grid, control_grid)
+
+            # A record cut short by a crash is dropped.
+            with open(path, "ab") as file:
+                file.write(bytes([0, 4, 0, 0, 0, 6]))
+            with ActionLog(path) as log:
+                self.assertEqual(len(log), 80)
+                self.assertEqual(os.path.getsize(path), size)
+
+            with open(path, "wb") as file:
+                file.write(b"not a log")
+            self.assertRaises(ValueError, ActionLog, path)
+
     def assertGridEqual(self, grid1: Grid, grid2: Grid):
         for x in range(len(grid1.grid)):
             for y in range(len(grid1[x])):
@@ -0,0 +1,83 @@
+import unittest
+from ed_utils.decorators import number
+
+from grid import Grid, SetGrid
+from layer_util import Layer
+from layers import rainbow, black, lighten, sparkle, darken, invert
+
+class TestSetGrid(unittest.TestCase):
+
+    def paint(self, grid: Grid):
+        grid[0][0].add(black)
+        grid[1][2].add(rainbow)
+        grid[1][2].add(lighten)
+        grid[3][1].add(sparkle)
+        grid[4][4].add(darken)
+        grid[4][4].erase(darken)
+        grid[2][2].special()
+
+    @number("9.3")
+    def test_matches_grid(self):
+        dense = Grid(Grid.DRAW_STYLE_SET, 5, 6)
+        arrays = SetGrid(Grid.DRAW_STYLE_SET, 5, 6)
+        for grid in [dense, arrays]:
+            self.paint(grid)
+        for timestamp in [0, 4.5]:
+            self.assertFrameMatches(arrays, dense, (10, 20, 30), timestamp)
+        for grid in [dense, arrays]:
+            grid.special()
+            grid[2][2].add(rainbow)
+            grid[0][0].special()
+        self.assertFrameMatches(arrays, dense, (10, 20, 30), 4.5)
+        self.assertFrameMatches(arrays, dense, (10, 20, 30), 9)
+        self.assertFrameMatches(arrays, dense, (200, 20, 30), 9)
+        self.assertIs(arrays[1][2].layer, lighten)
+        self.assertEqual(arrays[2][2].layer_sequence(), dense[2][2].layer_sequence())
+
+    @number("9.4")
+    def test_arrays(self):
+        grid = SetGrid(Grid.DRAW_STYLE_SET, 300, 200)
+        self.assertEqual(grid.layer_indices.nbytes + grid.inverted.nbytes, 2 * 300 * 200)
+        grid[299][199].add(black)
+        grid.special()
+        self.assertEqual(grid.render((1, 2, 3), 0)[299, 199].tolist(), [255, 255, 255])
+        self.assertEqual(grid.render((1, 2, 3), 0)[0, 0].tolist(), [1, 2, 3])
+        with self.assertRaises(ValueError):
+            grid[0][0].add(Layer(-1, lambda color, timestamp, x, y: color))
+        with self.assertRaises(ValueError):
+            SetGrid(Grid.DRAW_STYLE_ADD, 3, 3)
+
+    @number("9.5")
+    def test_animated_phases(self):
+        dense = Grid(Grid.DRAW_STYLE_SET, 12, 9)
+        arrays = SetGrid(Grid.DRAW_STYLE_SET, 12, 9)
+        for grid in [dense, arrays]:
+            for x in range(12):
+                for y in range(9):
+                    grid[x][y].add(sparkle if x < 10 else rainbow)
+        composited = []
+        composite_squares = arrays.composite_squares
+        def counting(xs, ys, timestamp):
+            composited.append(len(xs))
+            composite_squares(xs, ys, timestamp)
+        arrays.composite_squares = counting
+
+        timestamp = 0
+        for frame in range(40):
+            self.assertFrameMatches(arrays, dense, (255, 255, 255), timestamp)
+            timestamp += 1/60
+        arrays[3][3].add(invert)
+        dense[3][3].add(invert)
+        self.assertFrameMatches(arrays, dense, (255, 255, 255), timestamp)
+        # sparkle's phase moves every third of a second, so most frames only
+        # recompute the rainbow squares, which declare no phase.
+        self.assertLess(sum(composited), 12 * 9 + 41 * 2 * 9 + 10 * 9 * 3)
+
+    def assertFrameMatches(self, grid: Grid, other: Grid, start, timestamp):
+        self.assertEqual(grid.render(start, timestamp).tolist(), other.render(start, timestamp).tolist())
+        for x in range(grid.x):
+            for y in range(grid.y):
+                self.assertEqual(
+                    grid[x][y].get_color(start, timestamp, x, y),
+                    other[x][y].get_color(start, timestamp, x, y),
+                )
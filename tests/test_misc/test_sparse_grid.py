@@ -0,0 +1,56 @@
+import unittest
+from ed_utils.decorators import number
+
+from grid import Grid, SparseGrid
+from layers import rainbow, black, lighten, invert, sparkle, darken
+
+class TestSparseGrid(unittest.TestCase):
+
+    def paint(self, grid: Grid):
+        grid[0][0].add(black)
+        grid[1][2].add(rainbow)
+        grid[1][2].add(lighten)
+        grid[3][1].add(sparkle)
+        grid[3][1].add(invert)
+        grid[4][4].add(darken)
+        grid[4][4].erase(darken)
+
+    @number("9.1")
+    def test_matches_grid(self):
+        for style in Grid.DRAW_STYLE_OPTIONS:
+            dense = Grid(style, 5, 6)
+            sparse = SparseGrid(style, 5, 6)
+            for grid in [dense, sparse]:
+                self.paint(grid)
+                grid.special()
+                grid[2][2].add(darken)
+                grid[2][2].add(lighten)
+                grid.special()
+                grid.special()
+                grid[2][3].add(rainbow)
+            for timestamp in [0, 4.5]:
+                self.assertEqual(
+                    sparse.render((10, 20, 30), timestamp).tolist(),
+                    dense.render((10, 20, 30), timestamp).tolist(),
+                    f"{style} differs at {timestamp}"
+                )
+                for x in range(5):
+                    for y in range(6):
+                        self.assertEqual(
+                            sparse[x][y].get_color((10, 20, 30), timestamp, x, y),
+                            dense[x][y].get_color((10, 20, 30), timestamp, x, y),
+                        )
+
+    @number("9.2")
+    def test_only_painted_stores(self):
+        grid = SparseGrid(Grid.DRAW_STYLE_SET, 4096, 4096)
+        self.assertEqual(len(grid[0]), 4096)
+        self.assertEqual(list(grid.squares()), [])
+        grid[4000][12].add(black)
+        grid[5][5].erase(black)
+        grid.special()
+        self.assertEqual([(x, y) for x, y, _ in grid.squares()], [(4000, 12)])
+        self.assertEqual(grid.render((1, 2, 3), 0)[4000, 12].tolist(), [255, 255, 255])
+        self.assertEqual(grid.render((1, 2, 3), 0)[5, 5].tolist(), [1, 2, 3])
+        with self.assertRaises(IndexError):
+            grid[0][4096]
@@ -1,10 +1,11 @@
+import random
 import unittest
 from ed_utils.decorators import number
 
-from action import PaintAction, PaintStep
+from action import PackedActions, PaintAction, PaintStep
 from undo import UndoTracker
-from layers import green, red, blue
-from grid import Grid
+from layers import green, red, blue, black
+from grid import Grid, SparseGrid, SetGrid
 
 class TestUndo(unittest.TestCase):
 
@@ -65,6 +66,168 @@ class TestUndo(unittest.TestCase):
         action = undo.undo(grid)
         self.assertEqual(action, None)
 
+    @number("4.2")
+    def test_packed_history(self):
+        grid = Grid(Grid.DRAW_STYLE_ADD, 300, 40)
+        undo = UndoTracker(max_bytes=20000)
+        actions = []
+        for i in range(40):
+            if i % 9 == 4:
+                action = PaintAction([], is_special=True)
+            else:
+                action = PaintAction([PaintStep((j * 7 % 300, i), [red, green, blue][j % 3]) for j in range(50 * i % 257)])
+            actions.append(action)
+            undo.add_action(action)
+            action.redo_apply(grid)
+        self.assertLessEqual(undo.actions.nbytes, 20000)
+        self.assertLess(len(undo.actions), 40, "Oldest actions should have been evicted")
+        kept = len(undo.actions)
+        for action in reversed(actions[-kept:]):
+            self.assertEqual(undo.undo(grid), action)
+        self.assertIsNone(undo.undo(grid))
+        self.assertEqual(undo.redo(grid), actions[-kept])
+        self.assertEqual(undo.redo(grid), actions[-kept + 1])
+        # A new action means nothing undone can be redone.
+        undo.add_action(actions[0])
+        self.assertIsNone(undo.redo(grid))
+        self.assertEqual(undo.undo(grid), actions[0])
+        self.assertEqual(undo.undo(grid), actions[-kept + 1])
+        # An action larger than the whole budget is not kept.
+        undo.add_action(PaintAction([PaintStep((0, 0), red)] * 5000))
+        self.assertEqual(undo.undo(grid), actions[-kept])
+
+        # Budgets smaller than the starting buffers are kept from the start.
+        for max_bytes in [14, 100, 500]:
+            packed = PackedActions(max_bytes)
+            self.assertLessEqual(packed.nbytes, max_bytes)
+            for action in actions[1:4]:
+                packed.append(PaintAction(action.steps[:1]))
+                self.assertLessEqual(packed.nbytes, max_bytes)
+            self.assertEqual(packed[packed.end - 1], PaintAction(actions[3].steps[:1]))
+        self.assertRaises(ValueError, PackedActions, 13)
+
+    @number("4.3")
+    def test_checkpoints(self):
+        grids = [(Grid, style) for style in Grid.DRAW_STYLE_OPTIONS]
+        grids += [(SparseGrid, Grid.DRAW_STYLE_ADD), (SetGrid, Grid.DRAW_STYLE_SET)]
+        for grid_type, style in grids:
+            grid = grid_type(style, 12, 12)
+            undo = UndoTracker(grid=grid, checkpoint_actions=10)
+            actions = []
+            for i in range(95):
+                if i % 23 == 22:
+                    action = PaintAction([], is_special=True)
+                else:
+                    action = PaintAction([PaintStep(((i + j) % 12, (i * j) % 12), [red, green, blue][(i + j) % 3]) for j in range(i % 7 + 1)])
+                actions.append(action)
+                action.redo_apply(grid)
+                undo.add_action(action, grid)
+            self.assertEqual([number for number, _ in undo.checkpoints], list(range(20, 95, 10)))
+
+            for k in [91, 77, 45, 44, 21]:
+                undo.undo_to(grid, k)
+                self.assertEqual(undo.top, k)
+                control_grid = grid_type(style, 12, 12)
+                for action in actions[:k]:
+                    action.redo_apply(control_grid)
+                self.assertGridEqual(grid, control_grid)
+            self.assertEqual(undo.redo(grid), actions[21])
+            self.assertEqual(undo.undo_many(grid, 1000), 22)
+            self.assertIsNone(undo.undo(grid))
+            # Redoing from the start still works, and a new action drops later checkpoints.
+            undo.redo(grid)
+            undo.add_action(actions[0], grid)
+            self.assertEqual(undo.checkpoints, [])
+
+    @number("4.4")
+    def test_undo_to_without_checkpoints(self):
+        colors = [red, green, blue, red, green, blue]
+        results = []
+        for checkpoint_actions in [2, 1000]:
+            grid = Grid(Grid.DRAW_STYLE_SET, 3, 3)
+            undo = UndoTracker(grid=grid, checkpoint_actions=checkpoint_actions)
+            for color in colors:
+                action = PaintAction([PaintStep((0, 0), color)])
+                action.redo_apply(grid)
+                undo.add_action(action, grid)
+            self.assertEqual(bool(undo.checkpoints), checkpoint_actions == 2)
+            undo.undo_to(grid, 3)
+            results.append(grid[0][0].get_color((9, 9, 9), 0, 0, 0))
+        self.assertEqual(results, [(0, 0, 255), (0, 0, 255)])
+        self.assertRaises(ValueError, UndoTracker().undo_to, grid, 0)
+
+        # Once old actions are evicted, the base moves on past them.
+        grid = Grid(Grid.DRAW_STYLE_ADD, 20, 20)
+        undo = UndoTracker(max_bytes=2000, grid=grid)
+        actions = []
+        for i in range(200):
+            action = PaintAction([PaintStep((i % 20, j), colors[(i + j) % 6]) for j in range(i % 9)], is_special=i % 25 == 24)
+            actions.append(action)
+            action.redo_apply(grid)
+            undo.add_action(action, grid)
+        first = undo.actions.first
+        self.assertGreater(first, 0)
+        undo.undo_to(grid, 0)
+        self.assertEqual(undo.top, first)
+        control_grid = Grid(Grid.DRAW_STYLE_ADD, 20, 20)
+        for action in actions[:first]:
+            action.redo_apply(control_grid)
+        self.assertGridEqual(grid, control_grid)
+
+    @number("4.5")
+    def test_undo_to_after_undo_and_redo(self):
+        grids = [(Grid, style) for style in Grid.DRAW_STYLE_OPTIONS]
+        grids += [(SparseGrid, Grid.DRAW_STYLE_SEQUENCE), (SetGrid, Grid.DRAW_STYLE_SET)]
+        paints = [((3, 3), red), ((1, 1), blue), ((2, 2), green), ((3, 3), black)]
+        for grid_type, style in grids:
+            for new_action in [False, True]:
+                grid = grid_type(style, 5, 5)
+                undo = UndoTracker(grid=grid, checkpoint_actions=2)
+                for square, layer in paints:
+                    action = PaintAction([PaintStep(square, layer)])
+                    action.redo_apply(grid)
+                    undo.add_action(action, grid)
+                undo.undo(grid)
+                undo.undo(grid)
+                if new_action:
+                    action = PaintAction([PaintStep((4, 4), red)])
+                    action.redo_apply(grid)
+                    undo.add_action(action, grid)
+                else:
+                    undo.redo(grid)
+                undo.undo_to(grid, 2)
+                self.assertEqual(undo.top, 2)
+                self.assertHistoryApplied(grid, undo, grid_type, style)
+
+            # Any mix of stepping back, redo and new actions before undo_to.
+            # undo_to steps back here, since undo's erasing leaves the grid inexact for later checkpoints.
+            rng = random.Random(4)
+            grid = grid_type(style, 5, 5)
+            undo = UndoTracker(grid=grid, checkpoint_actions=3)
+            for _ in range(300):
+                choice = rng.random()
+                if choice < 0.5:
+                    if rng.random() < 0.05:
+                        action = PaintAction([], is_special=True)
+                    else:
+                        action = PaintAction([PaintStep((rng.randrange(5), rng.randrange(5)), rng.choice([red, blue, black])) for _ in range(rng.randrange(1, 4))])
+                    action.redo_apply(grid)
+                    undo.add_action(action, grid)
+                elif choice < 0.7:
+                    undo.undo_to(grid, undo.top - 1)
+                elif choice < 0.85:
+                    undo.redo(grid)
+                elif undo.top > 0:
+                    undo.undo_to(grid, rng.randrange(undo.top))
+                    self.assertHistoryApplied(grid, undo, grid_type, style)
+
+    def assertHistoryApplied(self, grid: Grid, undo: UndoTracker, grid_type, style):
+        """ Checks grid is the start grid with the tracker's first top actions applied. """
+        control_grid = grid_type(style, grid.x, grid.y)
+        for k in range(undo.top):
+            undo.actions[k].redo_apply(control_grid)
+        self.assertGridEqual(grid, control_grid)
+
     def assertGridEqual(self, grid1: Grid, grid2: Grid):
         for x in range(len(grid1.grid)):
             for y in range(len(grid1[x])):
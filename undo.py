@@ -1,17 +1,74 @@
 from __future__ import annotations
-from action import PaintAction
+import numpy as np
+from action import PaintAction, PackedActions
 from grid import Grid
 
 class UndoTracker:
+    """
+    Keeps the actions that can be undone, followed by those that can be redone,
+    packed by PackedActions so long sessions take a few bytes per step.
+    The oldest actions are dropped once max_bytes is used up.
 
-    def add_action(self, action: PaintAction) -> None:
+    Given the grid it starts on, the tracker keeps a copy of it (the base) as it was
+    before the oldest action held, moving it on as old actions are evicted.
+    When add_action is given the grid, a snapshot of it (a checkpoint) is kept every
+    checkpoint_actions (CHECKPOINT_ACTIONS by default) actions or CHECKPOINT_STEPS steps,
+    up to MAX_CHECKPOINTS of them.
+    undo_to restores the newest checkpoint before its target, or the base if there is none,
+    and redoes the few actions after it, instead of undoing every action in between.
+    """
+
+    DEFAULT_MAX_BYTES = 16 << 20
+    CHECKPOINT_ACTIONS = 50
+    CHECKPOINT_STEPS = 5000
+    MAX_CHECKPOINTS = 8
+
+    def __init__(
+        self,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        grid: Grid | None = None,
+        checkpoint_actions: int = CHECKPOINT_ACTIONS,
+    ) -> None:
+        """
+        grid, if given, is the grid the actions will be applied to, as it is before the first.
+        undo_to needs it.
+        """
+        self.actions = PackedActions(max_bytes, self._evict)
+        self.checkpoint_actions = checkpoint_actions
+        self.top = 0 # number of the action after the last one applied
+        # (number of actions applied, grid snapshot) pairs, oldest first.
+        self.checkpoints: list[tuple[int, object]] = []
+        # Number of actions kept the last time add_action dropped undone ones, or -1.
+        # Squares those actions changed are unknown, so older checkpoints are restored in full.
+        self.truncated = -1
+        # The grid before action actions.first, kept apart from the one being painted.
+        self.base: Grid | None = None
+        if grid is not None:
+            self.base = type(grid)(grid.draw_style, grid.x, grid.y)
+            self.base.restore(grid.snapshot())
+
+    def add_action(self, action: PaintAction, grid: Grid | None = None) -> None:
         """
         Adds an action to the undo tracker.
+        Any undone actions can no longer be redone.
 
-        If your collection is already full,
-        feel free to exit early and not add the action.
+        If the action alone is larger than the byte budget, it is not added.
+        grid, if given, should already have the action applied. It is used for checkpoints.
         """
-        raise NotImplementedError()
+        if self.top < self.actions.end:
+            self.truncated = self.top
+        self.actions.truncate(self.top)
+        while self.checkpoints and self.checkpoints[-1][0] > self.top:
+            self.checkpoints.pop()
+        if not self.actions.append(action):
+            return
+        self.top = self.actions.end
+        while self.checkpoints and self.checkpoints[0][0] < self.actions.first:
+            self.checkpoints.pop(0)
+        if grid is not None and self._checkpoint_due():
+            if len(self.checkpoints) == self.MAX_CHECKPOINTS:
+                self.checkpoints.pop(0)
+            self.checkpoints.append((self.top, grid.snapshot()))
 
     def undo(self, grid: Grid) -> PaintAction|None:
         """
@@ -20,7 +77,12 @@ class UndoTracker:
 
         :return: The action that was undone, or None.
         """
-        raise NotImplementedError()
+        if self.top <= self.actions.first:
+            return None
+        self.top -= 1
+        action = self.actions[self.top]
+        action.undo_apply(grid)
+        return action
 
     def redo(self, grid: Grid) -> PaintAction|None:
         """
@@ -29,4 +91,80 @@ class UndoTracker:
 
         :return: The action that was redone, or None.
         """
-        raise NotImplementedError()
+        if self.top >= self.actions.end:
+            return None
+        action = self.actions[self.top]
+        self.top += 1
+        action.redo_apply(grid)
+        return action
+
+    def undo_many(self, grid: Grid, count: int) -> int:
+        """
+        Undoes up to count actions, as undo_to does.
+
+        :return: The number of actions undone.
+        """
+        target = max(self.actions.first, self.top - count)
+        undone = self.top - target
+        self.undo_to(grid, target)
+        return undone
+
+    def undo_to(self, grid: Grid, k: int) -> None:
+        """
+        Undoes actions until only the first k are applied.
+        Does nothing if k is not below the current number of applied actions,
+        and stops at the oldest action still held.
+
+        The squares changed since the newest checkpoint at or before k are restored from it,
+        or from the base if there is no such checkpoint, and the actions from there up to k
+        are redone. That gives the grid exactly as it was after action k, which undo does not:
+        it erases each step's layer again, and in ADD style for instance that does not remove
+        the layer the step added. A checkpoint taken after such an undo keeps its result.
+
+        Every action held after the checkpoint has been applied at some point, undone or not,
+        so the squares those actions touch are the ones that may have changed since.
+        If add_action has dropped undone actions since the checkpoint, every square is restored.
+
+        :raises ValueError: if the tracker was not given the grid it started on.
+        :complexity: O(steps held after the checkpoint), plus O(squares) if a special was made
+                     or undone actions were dropped since it, or there was no checkpoint.
+        """
+        if self.base is None:
+            raise ValueError("undo_to needs the grid the tracker started on")
+        k = max(k, self.actions.first)
+        if k >= self.top:
+            return
+        number, snapshot = self.actions.first, None
+        for checkpoint in reversed(self.checkpoints):
+            if self.actions.first <= checkpoint[0] <= k:
+                number, snapshot = checkpoint
+                break
+        if snapshot is None:
+            snapshot = self.base.snapshot()
+        if number <= self.truncated or self.actions.count_specials(number, self.actions.end):
+            # special changed every square, or dropped actions changed unknown ones
+            grid.restore(snapshot)
+        else:
+            _, xs, ys = self.actions.step_arrays(number, self.actions.end)
+            changed = np.unique(np.stack([xs, ys], axis=1), axis=0)
+            grid.restore(snapshot, [tuple(position) for position in changed.tolist()])
+        for i in range(number, k):
+            self.actions[i].redo_apply(grid)
+        self.top = k
+
+    def steps_between(self, k: int, stop: int) -> int:
+        """ Number of steps in actions k to stop - 1. """
+        return self.actions.step_start(stop) - self.actions.step_start(k)
+
+    def _evict(self, action: PaintAction) -> None:
+        """ Moves the base on past the oldest action, which is about to be evicted. """
+        if self.base is not None:
+            action.redo_apply(self.base)
+
+    def _checkpoint_due(self) -> bool:
+        """ Whether enough actions or steps were added since the last checkpoint. """
+        last = self.checkpoints[-1][0] if self.checkpoints else self.actions.first
+        return (
+            self.top - last >= self.checkpoint_actions
+            or self.steps_between(max(last, self.actions.first), self.top) >= self.CHECKPOINT_STEPS
+        )